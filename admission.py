@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class Rejected(Exception):
+    """A task was refused at admission; retry after `retry_after` seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def __reduce__(self):
+        # Keeps retry_after when raised across the swarm store connection.
+        return Rejected, (str(self), self.retry_after)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, count=1):
+        # Returns 0 when `count` tokens were taken, else the seconds until
+        # they will be available. A batch bigger than the burst goes through
+        # on a full bucket and leaves it in debt.
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(count, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= count
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Limits on what SwarmIntegration.add_task accepts.
+
+    Each client gets a token bucket of `client_rate` tasks per second with
+    room for bursts of `client_burst`. Each specialization's pending queue
+    holds at most `queue_capacity` tasks (`capacities` overrides it per
+    specialization, None being unspecialized tasks); Swarm.make_room sheds
+    the lowest priority pending task to fit a higher priority one, and
+    refuses the newcomer otherwise.
+    """
+
+    def __init__(self, queue_capacity=None, capacities=None, client_rate=None, client_burst=None,
+                 retry_after=1.0, max_clients=10_000):
+        self.queue_capacity = queue_capacity
+        self.capacities = dict(capacities or {})
+        self.client_rate = client_rate
+        self.client_burst = client_burst or client_rate
+        # Seconds a client refused for a full queue is told to back off.
+        self.retry_after = retry_after
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.throttled = 0
+        self.rejected = 0
+        self.shed = 0
+
+    def capacity(self, specialization):
+        return self.capacities.get(specialization, self.queue_capacity)
+
+    def throttle(self, client, count=1):
+        if not self.client_rate:
+            return
+        with self.lock:
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                bucket = self.buckets[client] = TokenBucket(self.client_rate, self.client_burst)
+                # The least recently seen clients are forgotten, which at
+                # worst hands them a fresh burst.
+                while len(self.buckets) > self.max_clients:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(client)
+            wait = bucket.take(count)
+            if wait:
+                self.throttled += count
+        if wait:
+            raise Rejected(f"Rate limit of {self.client_rate} tasks/s exceeded", wait)
+
+    def record_rejected(self, count):
+        with self.lock:
+            self.rejected += count
+
+    def record_shed(self, count):
+        with self.lock:
+            self.shed += count
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+                "shed": self.shed,
+                "clients": len(self.buckets),
+            }
@@ -0,0 +1,266 @@
+import logging
+import math
+import random
+from collections import defaultdict, deque
+
+from swarm_stats import UNSPECIALIZED, QuantileSketch
+
+
+class Autoscaler:
+    """Per-specialization agent autoscaling controller.
+
+    For each specialization the wanted agent count is what keeps up with the
+    smoothed arrival rate at `target_utilization` plus what clears the
+    current backlog within `drain_time` seconds:
+
+        ceil(rate * service_time / target_utilization + depth * service_time / drain_time)
+
+    clamped to the specialization's (min, max). Scale-up happens at once;
+    scale-down only after a surplus has lasted `scale_down_ticks` ticks, and
+    only removes idle agents whose every specialization is in surplus.
+
+    `plan()` is pure bookkeeping over an observation dict, so the same
+    controller drives both a live SwarmIntegration (`step()`) and the
+    offline `simulate()` harness.
+    """
+
+    def __init__(self, min_agents=0, max_agents=16, limits=None, target_utilization=0.8, drain_time=10.0,
+                 scale_down_ticks=3, max_step=4, default_service_time=1.0, smoothing=0.5):
+        self.min_agents = min_agents
+        self.max_agents = max_agents
+        self.limits = limits or {}
+        self.target_utilization = target_utilization
+        self.drain_time = drain_time
+        self.scale_down_ticks = scale_down_ticks
+        self.max_step = max_step
+        self.default_service_time = default_service_time
+        self.smoothing = smoothing
+        self.arrival_rates = {}
+        self.surplus_ticks = defaultdict(int)
+        self.last_submitted = None
+
+    def desired_agents(self, specialization, depth, arrivals, service_time, interval):
+        rate = arrivals / interval
+        previous = self.arrival_rates.get(specialization)
+        if previous is not None:
+            rate = self.smoothing * rate + (1 - self.smoothing) * previous
+        self.arrival_rates[specialization] = rate
+        service_time = service_time or self.default_service_time
+        wanted = math.ceil(rate * service_time / self.target_utilization + depth * service_time / self.drain_time)
+        low, high = self.limits.get(specialization, (self.min_agents, self.max_agents))
+        return max(low, min(high, wanted))
+
+    def plan(self, observation, interval):
+        """Return (agents_to_add, agent_ids_to_remove).
+
+        observation = {
+            "specializations": {spec: {"depth", "arrivals", "service_time"}},
+            "agents": {agent_id: {"specializations": [...], "idle": bool}},
+        }
+        Spec None stands for unspecialized tasks, which any agent can run;
+        agents added for it get no specializations. agents_to_add is a list
+        of specialization lists, one per new agent.
+        """
+        agents = observation["agents"]
+        serving = defaultdict(int)
+        for agent in agents.values():
+            for specialization in agent["specializations"]:
+                serving[specialization] += 1
+        serving[None] = len(agents)
+
+        to_add = []
+        surplus = {}
+        for specialization, stats in observation["specializations"].items():
+            desired = self.desired_agents(specialization, stats["depth"], stats["arrivals"],
+                                          stats["service_time"], interval)
+            current = serving[specialization]
+            if desired > current:
+                self.surplus_ticks[specialization] = 0
+                count = min(desired - current, self.max_step)
+                to_add.extend([[specialization] if specialization is not None else []] * count)
+            elif desired < current:
+                self.surplus_ticks[specialization] += 1
+                if self.surplus_ticks[specialization] >= self.scale_down_ticks:
+                    surplus[specialization] = current - desired
+            else:
+                self.surplus_ticks[specialization] = 0
+
+        # Every agent also runs unspecialized tasks, so when those are
+        # tracked an agent only goes if they have a surplus too.
+        unspecialized = None in observation["specializations"]
+        to_remove = []
+        for agent_id, agent in sorted(agents.items()):
+            if len(to_remove) >= self.max_step:
+                break
+            specializations = set(agent["specializations"] or [None])
+            if unspecialized:
+                specializations.add(None)
+            if agent["idle"] and all(surplus.get(s, 0) > 0 for s in specializations):
+                to_remove.append(agent_id)
+                for specialization in specializations:
+                    surplus[specialization] -= 1
+        return to_add, to_remove
+
+    def observe(self, swarm):
+        """Build a plan() observation from a live SwarmIntegration."""
+        submitted = {None if key == UNSPECIALIZED else key: count
+                     for key, count in swarm.stats.snapshot()["tasks_per_specialization"].items()}
+        last = self.last_submitted or submitted
+        self.last_submitted = submitted
+
+        agent_specializations = dict(swarm.swarm.agents)
+        # Service time per specialization, whichever agents ran the tasks.
+        totals = defaultdict(lambda: [0, 0.0])
+        for (label,), histogram in list(swarm.swarm.metrics.execution_by_specialization.children.items()):
+            with histogram.lock:
+                totals[None if label == UNSPECIALIZED else label] = [histogram.count, histogram.sum]
+
+        depths = swarm.swarm.queue_depths()
+        specializations = set(depths) | set(submitted) | set(self.limits)
+        for specs in agent_specializations.values():
+            specializations.update(specs)
+        specializations.add(None)
+
+        agents = {}
+        for agent_id in list(swarm.active_agents):
+            if agent_id in swarm.stopping or agent_id not in agent_specializations:
+                continue
+            idle = swarm.agent_load[agent_id] <= 0 and not (swarm.scheduler and swarm.scheduler.queued(agent_id))
+            agents[agent_id] = {"specializations": agent_specializations[agent_id], "idle": idle}
+
+        return {
+            "specializations": {
+                specialization: {
+                    "depth": depths.get(specialization, 0),
+                    "arrivals": submitted.get(specialization, 0) - last.get(specialization, 0),
+                    "service_time": totals[specialization][1] / totals[specialization][0]
+                    if totals[specialization][0] else None,
+                } for specialization in specializations
+            },
+            "agents": agents,
+        }
+
+    def step(self, swarm, interval):
+        to_add, to_remove = self.plan(self.observe(swarm), interval)
+        for specializations in to_add:
+            swarm.add_agent(specializations)
+        for agent_id in to_remove:
+            swarm.remove_agent(agent_id)
+        if to_add or to_remove:
+            logging.info(f"Autoscaler added {len(to_add)} and removed {len(to_remove)} agents. "
+                         f"Total agents: {len(swarm.active_agents) - len(swarm.stopping)}")
+        return to_add, to_remove
+
+
+def burst_trace(duration, base_rates, bursts=(), seed=0):
+    """Synthetic arrivals as a list of (time, specialization) in time order.
+
+    base_rates: {specialization: tasks per second}, Poisson arrivals.
+    bursts: (start, end, specialization, extra tasks per second) tuples.
+    """
+    rng = random.Random(seed)
+    arrivals = []
+    sources = [(0, duration, specialization, rate) for specialization, rate in base_rates.items()]
+    sources.extend(bursts)
+    for start, end, specialization, rate in sources:
+        if rate <= 0:
+            continue
+        t = start + rng.expovariate(rate)
+        while t < end:
+            arrivals.append((t, specialization))
+            t += rng.expovariate(rate)
+    arrivals.sort(key=lambda arrival: (arrival[0], str(arrival[1])))
+    return arrivals
+
+
+def simulate(trace, policy, service_times, duration, tick=1.0, initial_agents=(), startup_ticks=1):
+    """Deterministic discrete-time replay of an arrival trace.
+
+    Agents process tasks from the specializations they serve (plus
+    unspecialized ones) at the fixed per-specialization service time;
+    `policy.plan()` runs once per tick and new agents start serving
+    `startup_ticks` later. Returns a summary and a per-tick timeline.
+    """
+    queues = defaultdict(deque)
+    agents = {}
+    pending_agents = []
+    next_agent_id = 0
+    for specializations in initial_agents:
+        agents[next_agent_id] = {"specializations": list(specializations), "budget": 0.0, "idle": True}
+        next_agent_id += 1
+
+    waits = QuantileSketch()
+    served = defaultdict(int)
+    arrivals_index = 0
+    timeline = []
+    agent_seconds = 0.0
+    now = 0.0
+    while now < duration or any(queues.values()):
+        tick_end = now + tick
+        arrived = defaultdict(int)
+        while arrivals_index < len(trace) and trace[arrivals_index][0] < tick_end:
+            arrival_time, specialization = trace[arrivals_index]
+            queues[specialization].append(arrival_time)
+            arrived[specialization] += 1
+            arrivals_index += 1
+
+        for agent in agents.values():
+            agent["budget"] += tick
+            agent["idle"] = True
+            runnable = agent["specializations"] + [None]
+            while True:
+                candidates = [s for s in runnable if queues[s]]
+                if not candidates:
+                    # Idle time cannot be banked for later bursts.
+                    agent["budget"] = 0.0
+                    break
+                agent["idle"] = False
+                specialization = min(candidates, key=lambda s: queues[s][0])
+                if agent["budget"] < service_times.get(specialization, 1.0):
+                    break
+                agent["budget"] -= service_times.get(specialization, 1.0)
+                waits.add(tick_end - queues[specialization].popleft())
+                served[specialization] += 1
+        agent_seconds += len(agents) * tick
+
+        observation = {
+            "specializations": {
+                specialization: {
+                    "depth": len(queues[specialization]),
+                    "arrivals": arrived.get(specialization, 0),
+                    "service_time": service_times.get(specialization) if served[specialization] else None,
+                } for specialization in set(queues) | set(service_times) | {None}
+            },
+            "agents": {agent_id: {"specializations": agent["specializations"],
+                                  "idle": agent["idle"] and not any(queues[s] for s in agent["specializations"] + [None])}
+                       for agent_id, agent in agents.items()},
+        }
+        to_add, to_remove = policy.plan(observation, tick)
+        for agent_id in to_remove:
+            agents.pop(agent_id, None)
+        for specializations in to_add:
+            pending_agents.append((now + startup_ticks * tick, next_agent_id, list(specializations)))
+            next_agent_id += 1
+        still_pending = []
+        for ready_at, agent_id, specializations in pending_agents:
+            if ready_at <= tick_end:
+                agents[agent_id] = {"specializations": specializations, "budget": 0.0, "idle": True}
+            else:
+                still_pending.append((ready_at, agent_id, specializations))
+        pending_agents = still_pending
+
+        timeline.append({"time": tick_end, "depth": sum(len(q) for q in queues.values()), "agents": len(agents)})
+        now = tick_end
+        if now > duration * 10:
+            break
+
+    return {
+        "tasks": len(trace),
+        "peak_depth": max((point["depth"] for point in timeline), default=0),
+        "wait_p50": waits.quantile(0.5),
+        "wait_p99": waits.quantile(0.99),
+        "drained_at": now,
+        "agent_seconds": agent_seconds,
+        "peak_agents": max((point["agents"] for point in timeline), default=0),
+        "final_agents": len(agents),
+    }, timeline
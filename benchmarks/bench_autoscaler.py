@@ -0,0 +1,70 @@
+"""Autoscaling policies replayed against bursty arrival traces.
+
+Runs the deterministic simulation in autoscaler.py, so results are exactly
+reproducible for a given seed. "fixed" is the old loop: every 10 s add one
+randomly specialized agent if pending > 2 * agents, never scale down.
+
+    python benchmarks/bench_autoscaler.py [--duration 300] [--seed 1]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autoscaler import Autoscaler, burst_trace, simulate
+
+SPECIALIZATIONS = ["math", "language", "image", "audio"]
+SERVICE_TIMES = {"math": 0.5, "language": 1.5, "image": 2.0, "audio": 1.0, None: 0.5}
+
+
+class FixedIntervalPolicy:
+    def __init__(self, interval_ticks=10, seed=0):
+        self.interval_ticks = interval_ticks
+        self.ticks = 0
+        self.rng = random.Random(seed)
+
+    def plan(self, observation, interval):
+        self.ticks += 1
+        if self.ticks % self.interval_ticks:
+            return [], []
+        pending = sum(stats["depth"] for stats in observation["specializations"].values())
+        if pending > len(observation["agents"]) * 2:
+            return [self.rng.sample(SPECIALIZATIONS, k=self.rng.randint(1, 3))], []
+        return [], []
+
+
+def traces(duration, seed):
+    base = {"math": 2.0, "language": 1.0, "image": 0.5, "audio": 1.0, None: 1.0}
+    third = duration / 3
+    return {
+        "steady": burst_trace(duration, base, seed=seed),
+        "single burst": burst_trace(duration, base, [(third, third + 30, "image", 6.0)], seed=seed),
+        "repeated bursts": burst_trace(duration, base, [(start, start + 15, specialization, 10.0)
+                                                        for start, specialization in zip(range(20, int(duration), 60),
+                                                                                         SPECIALIZATIONS * 10)],
+                                       seed=seed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    initial_rng = random.Random(args.seed)
+    initial_agents = [initial_rng.sample(SPECIALIZATIONS, k=initial_rng.randint(1, 3)) for _ in range(5)]
+    print(f"{'trace':>16} {'policy':>10} {'tasks':>6} {'peak depth':>11} {'wait p50':>9} {'wait p99':>9} "
+          f"{'drained at':>11} {'agent-s':>8} {'peak agents':>12}")
+    for name, trace in traces(args.duration, args.seed).items():
+        policies = {"fixed": FixedIntervalPolicy(seed=args.seed), "predictive": Autoscaler(min_agents=1)}
+        for policy_name, policy in policies.items():
+            r, _ = simulate(trace, policy, SERVICE_TIMES, args.duration, initial_agents=initial_agents)
+            print(f"{name:>16} {policy_name:>10} {r['tasks']:>6} {r['peak_depth']:>11} {r['wait_p50']:>9.1f} "
+                  f"{r['wait_p99']:>9.1f} {r['drained_at']:>11.0f} {r['agent_seconds']:>8.0f} {r['peak_agents']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Single versus bulk task ingestion, in-process and through the Flask API.
+
+Logging stays on (written to /dev/null) since per-task log lines are part
+of the cost being compared.
+
+    python benchmarks/bench_bulk_ingest.py [--tasks 10000]
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from swarm_integration import SwarmIntegration
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("byoai_script", os.path.join(ROOT, "byoai-script.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def specs(count):
+    return [{"description": f"Task {i}", "priority": i % 10, "specialization": "math"} for i in range(count)]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10_000)
+    args = parser.parse_args()
+    logging.getLogger().handlers = [logging.StreamHandler(open(os.devnull, "w"))]
+    tasks = specs(args.tasks)
+
+    results = []
+    swarm = SwarmIntegration()
+    results.append(("add_task loop", timed(lambda: [swarm.add_task(**t) for t in tasks])))
+    swarm = SwarmIntegration()
+    results.append(("add_tasks", timed(lambda: swarm.add_tasks(tasks))))
+
+    module = load_app()
+    client = module.app.test_client()
+    results.append(("POST add_task", timed(lambda: [client.post("/swarm/add_task", json=t) for t in tasks])))
+    results.append(("POST add_tasks json", timed(lambda: client.post("/swarm/add_tasks", json=tasks))))
+    body = "\n".join(json.dumps(t) for t in tasks)
+    results.append(("POST add_tasks ndjson", timed(
+        lambda: client.post("/swarm/add_tasks", data=body, content_type="application/x-ndjson"))))
+
+    print(f"{'path':>22} {'tasks/s':>11}")
+    for name, elapsed in results:
+        print(f"{name:>22} {args.tasks / elapsed:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Claim latency of Swarm.get_task as the pending backlog grows.
+
+Most of the backlog targets specializations the polling agent cannot run,
+which was the worst case for the old drain-and-requeue scan.
+
+    python benchmarks/bench_claim_latency.py [--sizes 1000 100000 1000000]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swarm_integration import Swarm, Task
+
+SPECIALIZATIONS = ["math", "language", "image", "audio"]
+
+
+def fill(swarm, size, rng):
+    for task_id in range(size):
+        # 1 in 100 tasks is claimable by the "math" agent below.
+        specialization = "math" if task_id % 100 == 0 else rng.choice(SPECIALIZATIONS[1:])
+        swarm.add_task(Task(task_id, f"Task {task_id}", rng.randint(0, 10), specialization))
+
+
+def measure(size, claims, seed):
+    rng = random.Random(seed)
+    swarm = Swarm()
+    fill(swarm, size, rng)
+    samples = []
+    for _ in range(min(claims, size // 100)):
+        start = time.perf_counter()
+        swarm.get_task(0, ["math"])
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "pending": size,
+        "claims": len(samples),
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p99_us": samples[int(len(samples) * 0.99)] * 1e6,
+        "max_us": samples[-1] * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--claims", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    print(f"{'pending':>10} {'claims':>7} {'p50 us':>9} {'p99 us':>9} {'max us':>9}")
+    for size in args.sizes:
+        r = measure(size, args.claims, args.seed)
+        print(f"{r['pending']:>10} {r['claims']:>7} {r['p50_us']:>9.2f} {r['p99_us']:>9.2f} {r['max_us']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
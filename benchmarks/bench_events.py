@@ -0,0 +1,115 @@
+"""Completion notification for thousands of subscribers: polling versus long-poll and SSE.
+
+Every subscriber waits for one task. "poll" asks for the task's status every
+--poll-interval seconds (a /swarm/wait with timeout=0, i.e. one status
+lookup per request), "wait" holds one /swarm/wait long-poll, "sse" holds one
+/swarm/events stream. Reports requests sent, the delay between a task
+completing and its subscriber hearing about it, and the threads in the
+process, which stay flat however many subscribers are connected.
+
+    python benchmarks/bench_events.py [--subscribers 2000] [--agents 50]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swarm_integration import SwarmIntegration
+from task_events import EventServer
+
+logging.disable(logging.CRITICAL)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response.split(b"\r\n\r\n", 1)[1]
+
+
+async def subscriber(mode, port, task_id, poll_interval, stats):
+    while True:
+        stats["requests"] += 1
+        if mode == "sse":
+            # The stream ends once its one task has finished.
+            await get(port, f"/swarm/events?task_ids={task_id}")
+            break
+        body = json.loads(await get(port, f"/swarm/wait?task_ids={task_id}&timeout={0 if mode == 'poll' else 30}"))
+        if body["tasks"]:
+            break
+        if mode == "poll":
+            await asyncio.sleep(poll_interval)
+    stats["heard"][task_id] = time.time()
+
+
+async def subscribe_all(mode, port, task_ids, poll_interval, stats, connected):
+    tasks = [asyncio.create_task(subscriber(mode, port, task_id, poll_interval, stats)) for task_id in task_ids]
+    await asyncio.sleep(0.5)
+    connected.set()
+    await asyncio.gather(*tasks)
+
+
+def run(mode, subscribers, agents, poll_interval):
+    swarm = SwarmIntegration()
+    swarm.execution_time_range = (0.05, 0.1)
+    server = EventServer(swarm, swarm.swarm.events)
+    port = server.start("127.0.0.1", 0)
+    task_ids = swarm.add_tasks({"description": f"Task {i}"} for i in range(subscribers))
+    stats = {"requests": 0, "heard": {}}
+    connected = threading.Event()
+    client = threading.Thread(target=asyncio.run,
+                              args=(subscribe_all(mode, port, task_ids, poll_interval, stats, connected),))
+    client.start()
+    connected.wait()
+    peak_subscribers = server.subscribers
+    threads = threading.active_count()
+    started = time.time()
+    for agent_id in range(agents):
+        swarm.register_agent(agent_id, [])
+        threading.Thread(target=swarm.agent_worker, args=(agent_id,), daemon=True).start()
+    client.join()
+    elapsed = time.time() - started
+    for agent_id in range(agents):
+        swarm.remove_agent(agent_id)
+    while swarm.workers:
+        time.sleep(0.05)
+    delays = [stats["heard"][task_id] - swarm.task_map[task_id].completion_time for task_id in task_ids]
+    return {
+        "requests": stats["requests"],
+        "elapsed": elapsed,
+        "p50": percentile(delays, 0.5),
+        "p99": percentile(delays, 0.99),
+        "subscribers": peak_subscribers,
+        "threads": threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    args = parser.parse_args()
+
+    print(f"{'mode':>6} {'requests':>9} {'seconds':>8} {'p50 ms':>8} {'p99 ms':>8} {'open':>6} {'threads':>8}")
+    for mode in ("poll", "wait", "sse"):
+        r = run(mode, args.subscribers, args.agents, args.poll_interval)
+        print(f"{mode:>6} {r['requests']:>9} {r['elapsed']:>8.2f} {r['p50'] * 1000:>8.1f} {r['p99'] * 1000:>8.1f} "
+              f"{r['subscribers']:>6} {r['threads']:>8}")
+
+
+if __name__ == "__main__":
+    main()
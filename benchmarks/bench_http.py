@@ -0,0 +1,104 @@
+"""HTTP load on /swarm/add_task and /swarm/task_status: development server versus production mode.
+
+Starts byoai-script.py once per serving mode, drives it from several client
+processes over keep-alive connections and reports requests/s and latency
+percentiles per endpoint.
+
+    python benchmarks/bench_http.py [--clients 16] [--duration 10] [--workers 4]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def client(port, duration, seed):
+    # Alternates add_task with a status lookup of a task this client added.
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    latencies = {"add_task": [], "task_status": []}
+    task_ids = []
+    deadline = time.perf_counter() + duration
+    i = seed
+    while time.perf_counter() < deadline:
+        body = json.dumps({"description": f"Load task {i}", "priority": i % 10,
+                           "specialization": ["math", "language", "image", "audio"][i % 4]})
+        started = time.perf_counter()
+        connection.request("POST", "/swarm/add_task", body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        task_ids.append(json.loads(response.read())["task_id"])
+        latencies["add_task"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        connection.request("GET", f"/swarm/task_status/{task_ids[i % len(task_ids)]}")
+        connection.getresponse().read()
+        latencies["task_status"].append(time.perf_counter() - started)
+        i += 1
+    connection.close()
+    return latencies
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/status")
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not come up")
+
+
+def run(server, port, clients, duration, workers):
+    env = dict(os.environ, CONTEXT_SERVER=server, CONTEXT_AGENT_PORT=str(port), CONTEXT_HTTP_WORKERS=str(workers))
+    with open(os.devnull, "w") as devnull:
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "byoai-script.py")], cwd=ROOT, env=env,
+                                   stdout=devnull, stderr=devnull, start_new_session=True)
+    try:
+        wait_until_up(port)
+        with multiprocessing.Pool(clients) as pool:
+            results = pool.starmap(client, [(port, duration, n * 1_000_000) for n in range(clients)])
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+    summary = {}
+    for endpoint in ("add_task", "task_status"):
+        latencies = [latency for result in results for latency in result[endpoint]]
+        summary[endpoint] = {
+            "rps": len(latencies) / duration,
+            "p50": percentile(latencies, 0.5),
+            "p99": percentile(latencies, 0.99),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--port", type=int, default=8199)
+    args = parser.parse_args()
+
+    print(f"{'server':>12} {'endpoint':>12} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for server in ("development", "production"):
+        summary = run(server, args.port, args.clients, args.duration, args.workers)
+        for endpoint, r in summary.items():
+            print(f"{server:>12} {endpoint:>12} {r['rps']:>8.0f} {r['p50'] * 1000:>8.2f} {r['p99'] * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Queue wait and backlog under sustained overload, with and without admission control.
+
+A "bulk" client offers low priority (1-4) work at several times what the
+agents can run while an "interactive" client sends priority 9 tasks at a
+modest rate. Without admission control the backlog and the wait of
+everything that is not top priority grow for as long as the overload lasts.
+With per-specialization queue capacity, priority shedding and per-client
+rate limits, the backlog stays bounded and so does the wait of every task
+that gets in. Tasks still queued at the end are counted at their age.
+
+    python benchmarks/bench_overload.py [--duration 10] [--agents 4] [--work 0.02]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import Rejected
+from swarm_integration import SwarmIntegration
+
+SPECIALIZATIONS = ["math", "language"]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def client(swarm, name, rate, priorities, duration, seed, submitted, refused):
+    # Offers `rate` tasks/s in 10 ms ticks.
+    rng = random.Random(seed)
+    deadline = time.time() + duration
+    tick = 0.01
+    owed = 0.0
+    while time.time() < deadline:
+        owed += rate * tick
+        while owed >= 1:
+            owed -= 1
+            priority = rng.choice(priorities)
+            try:
+                task_id = swarm.add_task(f"{name} task", priority, rng.choice(SPECIALIZATIONS), client=name)
+            except Rejected:
+                refused[name] += 1
+            else:
+                submitted[task_id] = (name, time.time())
+        time.sleep(tick)
+
+
+def run(admission, duration, agents, work, bulk_rate, interactive_rate):
+    # Half a second of work per queue, and a rate limit the bulk client
+    # alone can saturate the agents with.
+    options = {}
+    if admission:
+        options = dict(queue_capacity=int(agents / work / 2), client_rate=bulk_rate / 2, client_burst=bulk_rate / 10)
+    swarm = SwarmIntegration(max_completed=10 ** 7, **options)
+    for specialization in SPECIALIZATIONS:
+        swarm.set_task_body(specialization, lambda payload: time.sleep(work))
+    for agent_id in range(agents):
+        swarm.register_agent(agent_id, SPECIALIZATIONS)
+        threading.Thread(target=swarm.agent_worker, args=(agent_id,), daemon=True).start()
+
+    submitted = {}
+    refused = {"bulk": 0, "interactive": 0}
+    clients = [
+        threading.Thread(target=client, args=(swarm, "bulk", bulk_rate, [1, 2, 3, 4], duration, 1, submitted, refused)),
+        threading.Thread(target=client, args=(swarm, "interactive", interactive_rate, [9], duration, 2, submitted, refused)),
+    ]
+    for thread in clients:
+        thread.start()
+    peak = 0
+    while any(thread.is_alive() for thread in clients):
+        peak = max(peak, swarm.pending_tasks_count())
+        time.sleep(0.05)
+    ended = time.time()
+    for agent_id in range(agents):
+        swarm.remove_agent(agent_id)
+
+    results = {}
+    for name in ("bulk", "interactive"):
+        waits = []
+        shed = 0
+        for task_id, (owner, at) in list(submitted.items()):
+            if owner != name:
+                continue
+            task = swarm.task_map[task_id]
+            if task.status == "shed":
+                shed += 1
+            elif task.start_time and task.start_time <= ended:
+                waits.append(task.start_time - at)
+            else:
+                waits.append(ended - at)
+        results[name] = {
+            "accepted": len(waits) + shed,
+            "refused": refused[name],
+            "shed": shed,
+            "p50": percentile(waits, 0.5),
+            "p99": percentile(waits, 0.99),
+        }
+    return peak, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--work", type=float, default=0.02)
+    parser.add_argument("--bulk-rate", type=float, default=400)
+    parser.add_argument("--interactive-rate", type=float, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'admission':>9} {'peak queue':>10} {'client':>12} {'accepted':>9} {'refused':>8} {'shed':>6} "
+          f"{'p50 wait s':>10} {'p99 wait s':>10}")
+    for admission in (False, True):
+        peak, results = run(admission, args.duration, args.agents, args.work, args.bulk_rate, args.interactive_rate)
+        for name, r in results.items():
+            print(f"{'on' if admission else 'off':>9} {peak:>10} {name:>12} {r['accepted']:>9} {r['refused']:>8} "
+                  f"{r['shed']:>6} {r['p50']:>10.3f} {r['p99']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
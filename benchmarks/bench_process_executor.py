@@ -0,0 +1,66 @@
+"""CPU-bound throughput with inline execution versus a process pool.
+
+    python benchmarks/bench_process_executor.py [--tasks 200] [--workers 1 2 4]
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swarm_integration import SwarmIntegration
+from executors import process_pool
+
+
+def burn(payload):
+    total = 0
+    for i in range(300_000):
+        total += i * i
+    return total
+
+
+def run(tasks, agents, workers):
+    swarm = SwarmIntegration()
+    swarm.set_task_body("math", burn)
+    pool = None
+    if workers:
+        pool = process_pool(workers)
+        # Start the workers before timing so spawn cost is excluded.
+        list(pool.map(abs, range(workers)))
+        swarm.set_executor("math", pool)
+    for agent_id in range(agents):
+        swarm.register_agent(agent_id, ["math"])
+        threading.Thread(target=swarm.agent_worker, args=(agent_id,), daemon=True).start()
+
+    started = time.perf_counter()
+    for i in range(tasks):
+        swarm.add_task(f"Task {i}", specialization="math")
+    while len(swarm.completed_tasks) < tasks:
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    if pool:
+        pool.shutdown()
+    return tasks / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, os.cpu_count()])
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    agents = max(args.workers) * 2
+    baseline = run(args.tasks, agents, 0)
+    print(f"{'executor':>16} {'tasks/s':>9} {'speedup':>8}")
+    print(f"{'inline threads':>16} {baseline:>9.1f} {1.0:>8.2f}")
+    for workers in sorted(set(args.workers)):
+        rate = run(args.tasks, agents, workers)
+        print(f"{f'process x{workers}':>16} {rate:>9.1f} {rate / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
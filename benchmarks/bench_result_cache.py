@@ -0,0 +1,68 @@
+"""End-to-end time for a workload with repeated tasks, with and without the result cache.
+
+Each task body sleeps for --work seconds; --distinct controls how many
+different (description, specialization) pairs the --tasks submissions cover.
+
+    python benchmarks/bench_result_cache.py [--tasks 2000] [--distinct 200] [--agents 16]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swarm_integration import SwarmIntegration
+
+SPECIALIZATIONS = ["math", "language", "image", "audio", None]
+
+
+def run(cache_size, tasks, distinct, agents, work, seed):
+    swarm = SwarmIntegration(result_cache_size=cache_size)
+    body = lambda payload: time.sleep(work) or payload[1].upper()
+    for specialization in SPECIALIZATIONS:
+        swarm.set_task_body(specialization, body)
+    for agent_id in range(agents):
+        swarm.register_agent(agent_id, SPECIALIZATIONS[:-1])
+        threading.Thread(target=swarm.agent_worker, args=(agent_id,), daemon=True).start()
+
+    rng = random.Random(seed)
+    numbers = [rng.randrange(distinct) for _ in range(tasks)]
+    keys = [(f"Task {n}", SPECIALIZATIONS[n % 5]) for n in numbers]
+    started = time.perf_counter()
+    for offset in range(0, tasks, 100):
+        swarm.add_tasks({"description": d, "specialization": s} for d, s in keys[offset:offset + 100])
+        time.sleep(0.01)
+    while True:
+        snapshot = swarm.stats.snapshot()
+        if snapshot["completed"] + snapshot["failed"] >= tasks:
+            break
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    executed = sum(perf["completed"] for perf in list(swarm.agent_performance.values()))
+    return elapsed, executed, swarm.get_swarm_statistics()["result_cache"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=200)
+    parser.add_argument("--agents", type=int, default=16)
+    parser.add_argument("--work", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f"{'cache':>6} {'seconds':>8} {'executed':>9} {'hit rate':>9} {'coalesced':>10}")
+    for cache_size in (0, 10_000):
+        elapsed, executed, cache = run(cache_size, args.tasks, args.distinct, args.agents, args.work, args.seed)
+        hit_rate = f"{cache['hit_rate']:.2f}" if cache else "-"
+        coalesced = f"{cache['coalescing_rate']:.2f}" if cache else "-"
+        print(f"{'on' if cache_size else 'off':>6} {elapsed:>8.2f} {executed:>9} {hit_rate:>9} {coalesced:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Throughput and peak RSS of the thread and asyncio agent runtimes.
+
+Each mode runs in its own subprocess so RSS figures do not bleed into each
+other. Task bodies sleep, standing in for I/O-bound model backend calls.
+
+    python benchmarks/bench_runtime_modes.py [--agents 10000] [--tasks 50000]
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+
+def run_mode(mode, agents, tasks, io_time):
+    from swarm_integration import SwarmIntegration
+
+    logging.disable(logging.INFO)
+    swarm = SwarmIntegration()
+    swarm.execution_time_range = (io_time, io_time)
+    started = time.perf_counter()
+    swarm.start(num_agents=agents, mode=mode)
+    startup = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(tasks):
+        swarm.add_task(f"Task {i}")
+    while len(swarm.completed_tasks) < tasks:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "agents": agents,
+        "startup_s": startup,
+        "tasks_per_s": tasks / elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", type=int, default=10_000)
+    parser.add_argument("--tasks", type=int, default=50_000)
+    parser.add_argument("--io-time", type=float, default=0.05)
+    parser.add_argument("--modes", nargs="+", default=["thread", "asyncio"])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.agents, args.tasks, args.io_time)))
+        return
+
+    print(f"{'mode':>8} {'agents':>7} {'startup s':>10} {'tasks/s':>10} {'peak RSS MB':>12}")
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--agents", str(args.agents),
+             "--tasks", str(args.tasks), "--io-time", str(args.io_time)],
+            capture_output=True, text=True, check=True).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"{r['mode']:>8} {r['agents']:>7} {r['startup_s']:>10.2f} {r['tasks_per_s']:>10.0f} {r['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Cost of get_swarm_statistics as backlog and history grow.
+
+    python benchmarks/bench_statistics.py [--sizes 1000 100000 1000000]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swarm_integration import SwarmIntegration
+
+SPECIALIZATIONS = [None, "math", "language", "image", "audio"]
+
+
+def build(size):
+    # Half the tasks completed, half still pending.
+    swarm = SwarmIntegration(max_completed=size)
+    swarm.register_agent(0, SPECIALIZATIONS[1:])
+    for offset in range(0, size, 10_000):
+        swarm.add_tasks({"description": f"Task {i}", "specialization": SPECIALIZATIONS[i % 5]}
+                        for i in range(offset, min(offset + 10_000, size)))
+    for _ in range(size // 2):
+        swarm.complete_task(swarm.get_task(0), 0, 0.001)
+    return swarm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--calls", type=int, default=1000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    print(f"{'tasks':>10} {'statistics us':>14} {'state us':>10}")
+    for size in args.sizes:
+        swarm = build(size)
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            swarm.get_swarm_statistics()
+        statistics_us = (time.perf_counter() - start) / args.calls * 1e6
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            swarm.get_swarm_state()
+        state_us = (time.perf_counter() - start) / args.calls * 1e6
+        print(f"{size:>10} {statistics_us:>14.1f} {state_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
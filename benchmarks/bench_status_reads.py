@@ -0,0 +1,99 @@
+"""Read-heavy load on /swarm/task_status while agents are saturated.
+
+Starts byoai-script.py in production mode with 1, 2 and 4 HTTP workers, with
+and without snapshot reads (CONTEXT_SNAPSHOT_INTERVAL=0 sends every lookup to
+the store process). A writer keeps the queue full with bulk adds while
+reader processes look up random task IDs; reports status lookups/s and
+latency percentiles. Read throughput can only scale with workers if the
+machine has cores to spare.
+
+    python benchmarks/bench_status_reads.py [--readers 8] [--duration 10]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_http import ROOT, percentile, wait_until_up
+
+
+def writer(port, duration, batch):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        body = json.dumps([{"description": f"Write task {i + n}", "priority": n % 10,
+                            "specialization": ["math", "language"][n % 2]} for n in range(batch)])
+        connection.request("POST", "/swarm/add_tasks", body, {"Content-Type": "application/json"})
+        connection.getresponse().read()
+        i += batch
+    connection.close()
+
+
+def reader(port, duration, max_task_id, seed):
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        connection.request("GET", f"/swarm/task_status/{rng.randint(1, max_task_id)}")
+        connection.getresponse().read()
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+    return latencies
+
+
+def run(port, workers, snapshot_interval, readers, duration, preload):
+    env = dict(os.environ, CONTEXT_SERVER="production", CONTEXT_AGENT_PORT=str(port),
+               CONTEXT_HTTP_WORKERS=str(workers), CONTEXT_SNAPSHOT_INTERVAL=str(snapshot_interval),
+               CONTEXT_WORKFLOW_DIR=tempfile.mkdtemp(), CONTEXT_RESULT_CACHE_SIZE="0")
+    with open(os.devnull, "w") as devnull:
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "byoai-script.py")], cwd=ROOT, env=env,
+                                   stdout=devnull, stderr=devnull, start_new_session=True)
+    try:
+        wait_until_up(port)
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        body = json.dumps([{"description": f"Preload task {i}", "specialization": "math"} for i in range(preload)])
+        connection.request("POST", "/swarm/add_tasks", body, {"Content-Type": "application/json"})
+        connection.getresponse().read()
+        connection.close()
+        time.sleep(max(snapshot_interval, 0.1) * 2)
+        write = multiprocessing.Process(target=writer, args=(port, duration, 50))
+        write.start()
+        with multiprocessing.Pool(readers) as pool:
+            results = pool.starmap(reader, [(port, duration, preload, seed) for seed in range(readers)])
+        write.join()
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+    latencies = [latency for result in results for latency in result]
+    return len(latencies) / duration, percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--preload", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8299)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'reads':>10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for workers in (1, 2, 4):
+        for interval, label in ((0, "store"), (0.1, "snapshot")):
+            rps, p50, p99 = run(args.port, workers, interval, args.readers, args.duration, args.preload)
+            print(f"{workers:>8} {label:>10} {rps:>8.0f} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Enqueue throughput with the task log on and off, and recovery time.
+
+    python benchmarks/bench_task_log.py [--tasks 200000] [--recovery-tasks 1000000]
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swarm_integration import SwarmIntegration
+from task_log import TaskLog
+
+SPECIALIZATIONS = [None, "math", "language", "image", "audio"]
+
+
+def ingest(swarm, tasks, batch):
+    start = time.perf_counter()
+    if batch:
+        for offset in range(0, tasks, batch):
+            swarm.add_tasks({"description": f"Task {i}", "priority": i % 10,
+                             "specialization": SPECIALIZATIONS[i % 5]} for i in range(offset, min(offset + batch, tasks)))
+    else:
+        for i in range(tasks):
+            swarm.add_task(f"Task {i}", i % 10, SPECIALIZATIONS[i % 5])
+    if swarm.task_log:
+        swarm.task_log.sync()
+    return tasks / (time.perf_counter() - start)
+
+
+def write_log(directory, tasks):
+    # Never snapshot here: there is no live state behind this writer.
+    log = TaskLog(directory, snapshot_every=float("inf"))
+    log.start(lambda: [])
+    for offset in range(0, tasks, 10_000):
+        log.extend([["a", i, f"Task {i}", i % 10, SPECIALIZATIONS[i % 5], 30] for i in range(offset + 1, min(offset + 10_000, tasks) + 1)])
+        log.sync()
+    # A third of the tasks completed before the "crash".
+    log.extend([["d", i, "completed", 0.0] for i in range(1, tasks + 1, 3)])
+    log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=200_000)
+    parser.add_argument("--recovery-tasks", type=int, default=1_000_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{'mode':>28} {'tasks/s':>10}")
+    for batch in (0, 1000):
+        label = "add_tasks x1000" if batch else "add_task"
+        print(f"{label + ' (no log)':>28} {ingest(SwarmIntegration(), args.tasks, batch):>10.0f}")
+        directory = tempfile.mkdtemp()
+        try:
+            swarm = SwarmIntegration(persistence_dir=directory)
+            print(f"{label + ' (task log)':>28} {ingest(swarm, args.tasks, batch):>10.0f}")
+            swarm.task_log.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    directory = tempfile.mkdtemp()
+    try:
+        write_log(directory, args.recovery_tasks)
+        start = time.perf_counter()
+        swarm = SwarmIntegration(persistence_dir=directory)
+        elapsed = time.perf_counter() - start
+        print(f"recovered {len(swarm.task_map)} tasks ({swarm.swarm.pending_tasks_count()} pending) in {elapsed:.2f}s")
+        start = time.perf_counter()
+        swarm.task_log.snapshot()
+        print(f"compacted snapshot written in {time.perf_counter() - start:.2f}s")
+        swarm.task_log.close()
+        start = time.perf_counter()
+        SwarmIntegration(persistence_dir=directory).task_log.close()
+        print(f"recovered from snapshot in {time.perf_counter() - start:.2f}s")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Bytes per task for the slotted Task versus a plain __dict__ class.
+
+Also shows that completed-task history stays bounded by the retention
+policy however many tasks flow through.
+
+    python benchmarks/bench_task_memory.py [--tasks 200000]
+"""
+import argparse
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swarm_integration import SwarmIntegration, Task
+
+
+class DictTask:
+    # The Task layout before __slots__ and interning.
+    def __init__(self, task_id, description, priority=0, specialization=None, timeout=30):
+        self.task_id = task_id
+        self.description = description
+        self.priority = priority
+        self.specialization = specialization
+        self.status = "pending"
+        self.start_time = None
+        self.completion_time = None
+        self.assigned_agent = None
+        self.timeout = timeout
+        self.enqueue_time = None
+        self.result = None
+
+
+def bytes_per_task(cls, count):
+    # Descriptions come from JSON payloads, so build fresh (non-literal)
+    # strings the way a request parser would; a few hundred distinct values
+    # stands in for workflows and retries resubmitting the same work.
+    gc.collect()
+    tracemalloc.start()
+    tasks = [cls(i, "".join(["Summarize document ", str(i % 500)]), i % 10, "".join(["ma", "th"]))
+             for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tasks
+    return used / count
+
+
+def retained_after(count, max_completed):
+    swarm = SwarmIntegration(max_completed=max_completed)
+    swarm.register_agent(0, [])
+    for offset in range(0, count, 10_000):
+        swarm.add_tasks({"description": f"Task {i}"} for i in range(offset, offset + 10_000))
+        for _ in range(10_000):
+            swarm.complete_task(swarm.get_task(0), 0, 0.0)
+    return len(swarm.task_map), len(swarm.completed_tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=200_000)
+    parser.add_argument("--max-completed", type=int, default=10_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    before = bytes_per_task(DictTask, args.tasks)
+    after = bytes_per_task(Task, args.tasks)
+    print(f"__dict__ Task: {before:8.1f} bytes/task")
+    print(f"slotted Task:  {after:8.1f} bytes/task ({(1 - after / before) * 100:.0f}% smaller)")
+    task_map, completed = retained_after(args.tasks, args.max_completed)
+    print(f"after {args.tasks} completions with max_completed={args.max_completed}: "
+          f"task_map={task_map} completed_tasks={completed}")
+
+
+if __name__ == "__main__":
+    main()
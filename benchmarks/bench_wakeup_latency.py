@@ -0,0 +1,55 @@
+"""Idle CPU and enqueue-to-claim latency with many parked agents.
+
+    python benchmarks/bench_wakeup_latency.py [--agents 200] [--tasks 2000]
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swarm_integration import SwarmIntegration
+
+SPECIALIZATIONS = ["math", "language", "image", "audio"]
+
+
+def claim_loop(swarm, agent_id):
+    while True:
+        task = swarm.get_task(agent_id, timeout=swarm.idle_timeout)
+        if task:
+            swarm.swarm.complete_task(task, agent_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--idle-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    swarm = SwarmIntegration()
+    for agent_id in range(args.agents):
+        swarm.register_agent(agent_id, [SPECIALIZATIONS[agent_id % len(SPECIALIZATIONS)]])
+        threading.Thread(target=claim_loop, args=(swarm, agent_id), daemon=True).start()
+
+    time.sleep(0.5)
+    cpu_start = time.process_time()
+    time.sleep(args.idle_seconds)
+    idle_cpu = (time.process_time() - cpu_start) / args.idle_seconds
+
+    for i in range(args.tasks):
+        swarm.add_task(f"Task {i}", specialization=SPECIALIZATIONS[i % len(SPECIALIZATIONS)])
+        time.sleep(0.0005)
+    time.sleep(0.5)
+
+    latency = swarm.get_claim_latency()
+    print(f"agents={args.agents} idle_cpu={idle_cpu * 100:.2f}% of one core")
+    print(f"claims={latency['count']} p50<={latency['p50'] * 1e3:.3f}ms p99<={latency['p99'] * 1e3:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
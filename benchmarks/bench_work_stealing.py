@@ -0,0 +1,67 @@
+"""Swarm lock contention with many agents: global claims versus work stealing.
+
+Task bodies are near-instant so the claim path dominates.
+
+    python benchmarks/bench_work_stealing.py [--agents 64] [--tasks 50000]
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swarm_integration import SwarmIntegration
+
+SPECIALIZATIONS = ["math", "language", "image", "audio"]
+
+
+def noop(payload):
+    return None
+
+
+def run(scheduler, agents, tasks, prefetch):
+    swarm = SwarmIntegration(scheduler=scheduler, prefetch=prefetch)
+    for specialization in SPECIALIZATIONS + [None]:
+        swarm.set_task_body(specialization, noop)
+    for agent_id in range(agents):
+        swarm.register_agent(agent_id, [SPECIALIZATIONS[agent_id % 4], SPECIALIZATIONS[(agent_id + 1) % 4]])
+        threading.Thread(target=swarm.agent_worker, args=(agent_id,), daemon=True).start()
+    time.sleep(0.2)
+
+    started = time.perf_counter()
+    for offset in range(0, tasks, 1000):
+        swarm.add_tasks({"description": f"Task {i}", "priority": i % 10,
+                         "specialization": (SPECIALIZATIONS + [None])[i % 5]} for i in range(offset, offset + 1000))
+    while swarm.stats.snapshot()["completed"] < tasks:
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    lock_hold = swarm.swarm.metrics.get_task_lock_hold.snapshot()
+    busy = sorted(perf["completed"] for perf in swarm.agent_performance.values())
+    return {
+        "tasks_per_s": tasks / elapsed,
+        "lock_acquisitions": lock_hold["count"],
+        "lock_hold_s": lock_hold["sum"],
+        "min_max_per_agent": (busy[0], busy[-1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", type=int, default=64)
+    parser.add_argument("--tasks", type=int, default=50_000)
+    parser.add_argument("--prefetch", type=int, default=8)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f"{'scheduler':>14} {'tasks/s':>9} {'lock acq':>9} {'lock hold s':>12} {'tasks/agent min-max':>20}")
+    for scheduler in ("global", "work_stealing"):
+        r = run(scheduler, args.agents, args.tasks, args.prefetch)
+        spread = f"{r['min_max_per_agent'][0]}-{r['min_max_per_agent'][1]}"
+        print(f"{scheduler:>14} {r['tasks_per_s']:>9.0f} {r['lock_acquisitions']:>9} {r['lock_hold_s']:>12.3f} {spread:>20}")
+
+
+if __name__ == "__main__":
+    main()
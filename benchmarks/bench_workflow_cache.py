@@ -0,0 +1,98 @@
+"""Workflow startup cost with hundreds of files: parse-everything versus the workflow cache.
+
+    python benchmarks/bench_workflow_cache.py [--files 500] [--steps 20]
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflow_cache import WorkflowCache
+
+SPECIALIZATIONS = ["math", "language", "image", "audio"]
+LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def write_workflows(directory, files, steps):
+    for n in range(files):
+        workflow = {"name": f"Workflow {n}", "steps": [
+            {"name": f"Step {n}.{i}", "priority": i % 10, "specialization": SPECIALIZATIONS[i % 4]} for i in range(steps)]}
+        with open(os.path.join(directory, f"workflow_{n:04d}.yml"), "w") as f:
+            yaml.safe_dump(workflow, f)
+
+
+def parse_everything(directory):
+    # What main() did before: read and parse every file, enqueue every step.
+    enqueued = 0
+    for name in os.listdir(directory):
+        if name.endswith(".yml"):
+            with open(os.path.join(directory, name)) as f:
+                enqueued += len(yaml.safe_load(f)["steps"])
+    return enqueued
+
+
+def sync(directory, state_path):
+    enqueued = []
+
+    def execute(workflow, steps):
+        enqueued.extend(steps)
+        return steps
+
+    cache = WorkflowCache(directory, lambda name, data: yaml.load(data, Loader=LOADER), state_path)
+    cache.sync(execute)
+    return len(enqueued)
+
+
+def add_step(path):
+    with open(path) as f:
+        workflow = yaml.safe_load(f)
+    workflow["steps"].append({"name": "Extra step", "priority": 1, "specialization": "math"})
+    with open(path, "w") as f:
+        yaml.safe_dump(workflow, f)
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--steps", type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    directory = tempfile.mkdtemp()
+    try:
+        workflows = os.path.join(directory, "workflows")
+        os.mkdir(workflows)
+        state_path = os.path.join(directory, "workflow_state.json")
+        write_workflows(workflows, args.files, args.steps)
+
+        print(f"{'startup':>28} {'seconds':>8} {'steps enqueued':>15}")
+        for label, fn, fn_args in [
+            ("parse everything", parse_everything, (workflows,)),
+            ("cache, cold", sync, (workflows, state_path)),
+            ("cache, restart", sync, (workflows, state_path)),
+        ]:
+            elapsed, enqueued = timed(fn, *fn_args)
+            print(f"{label:>28} {elapsed:>8.3f} {enqueued:>15}")
+
+        add_step(os.path.join(workflows, "workflow_0000.yml"))
+        elapsed, enqueued = timed(sync, workflows, state_path)
+        print(f"{'cache, restart after 1 edit':>28} {elapsed:>8.3f} {enqueued:>15}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Benchmark suite for the swarm core and the HTTP API, checked against stored baselines.
+
+Each scenario replays a seeded synthetic arrival trace of mixed priorities
+and specializations, either straight into SwarmIntegration or through the
+Flask endpoints of a byoai-script.py server, with executors.DeterministicWork
+as the agent body so every task takes the same time on every run. Scenarios
+run in fresh processes, so peak RSS is per scenario. Results are compared
+with benchmarks/baselines.json: a metric worse than its baseline by more
+than --tolerance is a regression and makes the exit status 1.
+
+    python benchmarks/suite.py [--scenarios core_burst,http_production] [--tolerance 0.25] [--slack-ms 20]
+                               [--update-baselines]
+"""
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import os
+import random
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+SPECIALIZATIONS = ["math", "language", "image", "audio", None]
+PRIORITIES = [1, 5, 9]
+PRIORITY_WEIGHTS = [6, 3, 1]
+
+# kind, trace (tasks, tasks/s or None for all at once), agents or HTTP
+# workers, mean simulated work in seconds.
+SCENARIOS = {
+    # Pure scheduling overhead: a 20k task backlog drained by 16 agents.
+    "core_burst": {"kind": "core", "tasks": 20000, "rate": None, "agents": 16, "work": 0.0},
+    # Steady Poisson load at about 60% of what 16 agents can run.
+    "core_poisson": {"kind": "core", "tasks": 3000, "rate": 500, "agents": 16, "work": 0.02},
+    "http_development": {"kind": "http", "server": "development", "tasks": 1500, "rate": 250, "workers": 1,
+                         "work": 0.005},
+    "http_production": {"kind": "http", "server": "production", "tasks": 1500, "rate": 250, "workers": 2,
+                        "work": 0.005},
+}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def make_trace(tasks, rate, seed):
+    # [(arrival offset in seconds, priority, specialization)]
+    rng = random.Random(seed)
+    trace = []
+    at = 0.0
+    for _ in range(tasks):
+        if rate:
+            at += rng.expovariate(rate)
+        trace.append((at, rng.choices(PRIORITIES, PRIORITY_WEIGHTS)[0], rng.choice(SPECIALIZATIONS)))
+    return trace
+
+
+def peak_rss_mb(pids=None):
+    # Peak resident set of this process, or summed over `pids` (Linux).
+    if pids is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+        except (OSError, StopIteration):
+            pass
+    return total / 1024
+
+
+def run_core(scenario, seed):
+    from executors import DeterministicWork
+    from swarm_integration import SwarmIntegration
+
+    trace = make_trace(scenario["tasks"], scenario["rate"], seed)
+    swarm = SwarmIntegration(max_completed=len(trace))
+    swarm.set_default_task_body(DeterministicWork(scenario["work"], seed))
+    for agent_id in range(scenario["agents"]):
+        swarm.register_agent(agent_id, SPECIALIZATIONS[:-1])
+        threading.Thread(target=swarm.agent_worker, args=(agent_id,), daemon=True).start()
+
+    submitted = {}
+    started = time.time()
+    if scenario["rate"] is None:
+        for offset in range(0, len(trace), 1000):
+            chunk = trace[offset:offset + 1000]
+            now = time.time()
+            task_ids = swarm.add_tasks({"description": f"Trace task {offset + i}", "priority": priority,
+                                        "specialization": specialization}
+                                       for i, (_, priority, specialization) in enumerate(chunk))
+            submitted.update((task_id, now) for task_id in task_ids)
+    else:
+        for i, (at, priority, specialization) in enumerate(trace):
+            delay = started + at - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            submitted[swarm.add_task(f"Trace task {i}", priority, specialization)] = time.time()
+    deadline = time.time() + 300
+    while swarm.stats.snapshot()["completed"] < len(trace) and time.time() < deadline:
+        time.sleep(0.01)
+    elapsed = time.time() - started
+
+    waits = []
+    latencies = {priority: [] for priority in PRIORITIES}
+    for task_id, at in submitted.items():
+        task = swarm.task_map[task_id]
+        waits.append(task.start_time - at)
+        latencies[task.priority].append(task.completion_time - at)
+    every = [latency for values in latencies.values() for latency in values]
+    if scenario["rate"] is None:
+        # Every task arrived at once, so the other percentiles only restate
+        # the drain time; how soon the top priority gets out is the signal.
+        return {
+            "tasks_per_s": len(trace) / elapsed,
+            "latency_p99_priority_9_ms": percentile(latencies[9], 0.99) * 1000,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    return {
+        "tasks_per_s": len(trace) / elapsed,
+        "queue_wait_p50_ms": percentile(waits, 0.5) * 1000,
+        "queue_wait_p99_ms": percentile(waits, 0.99) * 1000,
+        "latency_p50_ms": percentile(every, 0.5) * 1000,
+        "latency_p99_ms": percentile(every, 0.99) * 1000,
+        "latency_p99_priority_9_ms": percentile(latencies[9], 0.99) * 1000,
+        "latency_p99_priority_1_ms": percentile(latencies[1], 0.99) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/status")
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not come up")
+
+
+def completed_tasks(port):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    connection.request("GET", "/swarm/statistics")
+    statistics = json.loads(connection.getresponse().read())
+    return sum(statistics["completed_per_specialization"].values())
+
+
+def replay_http(port, trace, senders=16):
+    # Open loop: each sender takes the next arrival and sends it when it is
+    # due. Latency counts from the due time, so a server that falls behind
+    # is charged for the queueing it causes.
+    arrivals = itertools.count()
+    latencies = []
+    failures = []
+    started = time.perf_counter()
+
+    def sender():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while True:
+            i = next(arrivals)
+            if i >= len(trace):
+                break
+            at, priority, specialization = trace[i]
+            due = started + at
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            body = json.dumps({"description": f"Trace task {i}", "priority": priority,
+                               "specialization": specialization})
+            connection.request("POST", "/swarm/add_task", body, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - due)
+            if response.status not in (200, 201):
+                failures.append(response.status)
+        connection.close()
+
+    threads = [threading.Thread(target=sender) for _ in range(senders)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, failures, time.perf_counter() - started
+
+
+def run_http(scenario, seed, port=8399):
+    trace = make_trace(scenario["tasks"], scenario["rate"], seed)
+    env = dict(os.environ, CONTEXT_SERVER=scenario["server"], CONTEXT_AGENT_PORT=str(port),
+               CONTEXT_EVENTS_PORT=str(port + 1), CONTEXT_HTTP_WORKERS=str(scenario["workers"]),
+               CONTEXT_WORKFLOW_DIR=tempfile.mkdtemp(), CONTEXT_MIN_AGENTS="4",
+               CONTEXT_SIMULATED_WORK_MEAN=str(scenario["work"]), CONTEXT_SIMULATED_WORK_SEED=str(seed))
+    with open(os.devnull, "w") as devnull:
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "byoai-script.py")], cwd=ROOT, env=env,
+                                  stdout=devnull, stderr=devnull, start_new_session=True)
+    try:
+        wait_until_up(port)
+        started = time.perf_counter()
+        latencies, failures, sent = replay_http(port, trace)
+        deadline = time.time() + 300
+        while completed_tasks(port) < len(trace) and time.time() < deadline:
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        pids = [int(pid) for pid in os.listdir("/proc") if pid.isdigit() and _session_of(pid) == server.pid]
+        rss = peak_rss_mb(pids)
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+    if failures:
+        raise RuntimeError(f"{len(failures)} requests failed, e.g. HTTP {failures[0]}")
+    return {
+        "requests_per_s": len(trace) / sent,
+        "request_p50_ms": percentile(latencies, 0.5) * 1000,
+        "request_p99_ms": percentile(latencies, 0.99) * 1000,
+        "tasks_per_s": len(trace) / elapsed,
+        "peak_rss_mb": rss,
+    }
+
+
+def _session_of(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the parenthesised command name; session is the 4th.
+            return int(f.read().rsplit(")", 1)[1].split()[3])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def lower_is_better(metric):
+    return not metric.endswith("_per_s")
+
+
+def compare(results, baselines, tolerance, slack_ms):
+    regressions = []
+    print(f"{'scenario':>18} {'metric':>26} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            baseline = baselines.get(name, {}).get(metric)
+            if not baseline:
+                print(f"{name:>18} {metric:>26} {'-':>10} {value:>10.2f} {'new':>8}")
+                continue
+            change = (value - baseline) / baseline
+            worse = change if lower_is_better(metric) else -change
+            # Millisecond percentiles on a busy machine jitter by a few
+            # scheduler ticks, which is a large fraction of a small baseline.
+            noise = metric.endswith("_ms") and value - baseline <= slack_ms
+            flag = " REGRESSION" if worse > tolerance and not noise else ""
+            if flag:
+                regressions.append((name, metric))
+            print(f"{name:>18} {metric:>26} {baseline:>10.2f} {value:>10.2f} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fractional slowdown per metric")
+    parser.add_argument("--slack-ms", type=float, default=20, help="latency increases up to this are never regressions")
+    parser.add_argument("--baselines", default=BASELINES)
+    parser.add_argument("--update-baselines", action="store_true")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        # Child process: run one scenario and print its metrics as JSON.
+        logging.disable(logging.CRITICAL)
+        scenario = SCENARIOS[args.run]
+        run = run_core if scenario["kind"] == "core" else run_http
+        print(json.dumps(run(scenario, args.seed)))
+        return
+
+    results = {}
+    for name in args.scenarios.split(","):
+        if name not in SCENARIOS:
+            parser.error(f"Unknown scenario: {name}")
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", name, "--seed", str(args.seed)],
+                                capture_output=True, text=True)
+        if output.returncode:
+            sys.exit(f"Scenario {name} failed:\n{output.stderr}")
+        results[name] = json.loads(output.stdout.splitlines()[-1])
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)["scenarios"]
+    regressions = compare(results, baselines, args.tolerance, args.slack_ms)
+
+    if args.update_baselines:
+        baselines.update(results)
+        with open(args.baselines, "w") as f:
+            json.dump({"machine": {"cpus": os.cpu_count(), "python": sys.version.split()[0]},
+                       "seed": args.seed, "scenarios": baselines}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines written to {args.baselines}")
+    elif regressions:
+        sys.exit(f"{len(regressions)} metrics regressed by more than {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,154 @@
 import os
+import math
+import json
 import yaml
 import logging
 from swarm_integration import SwarmIntegration
-from flask import Flask, request, jsonify, redirect
+from autoscaler import Autoscaler
+from executors import DeterministicWork, process_pool
+from swarm_server import SwarmClient, parse_address, serve_swarm, start_store_process, run_http_server
+from workflow_cache import WorkflowCache
+from state_snapshot import SnapshotReader
+from task_events import EventServer
+from admission import Rejected
+from scheduling import create_policy, parse_weights
+from sharding import FORWARDED_HEADER, NODE_BITS, PeerError, ShardRouter, parse_peers
+from flask import Flask, Response, request, jsonify, redirect
 from werkzeug.exceptions import BadRequest, NotFound
 import threading
 import time
+import tempfile
+from collections import defaultdict
 
 # Updated environment variables
 CONTEXT_WORKFLOW_DIR = os.environ.get('CONTEXT_WORKFLOW_DIR', 'workflows')
 CONTEXT_AGENT_PORT = int(os.environ.get('CONTEXT_AGENT_PORT', '8099'))
 CONTEXT_AGENT_HOST = '0.0.0.0'
+CONTEXT_EVENTS_PORT = int(os.environ.get('CONTEXT_EVENTS_PORT', str(CONTEXT_AGENT_PORT + 1)))
+CONTEXT_AGENT_MODE = os.environ.get('CONTEXT_AGENT_MODE', 'thread')
+CONTEXT_PROCESS_SPECIALIZATIONS = [s for s in os.environ.get('CONTEXT_PROCESS_SPECIALIZATIONS', '').split(',') if s]
+CONTEXT_PROCESS_WORKERS = int(os.environ.get('CONTEXT_PROCESS_WORKERS', '0')) or None
+CONTEXT_PERSISTENCE_DIR = os.environ.get('CONTEXT_PERSISTENCE_DIR')
+CONTEXT_SCHEDULER = os.environ.get('CONTEXT_SCHEDULER', 'global')
+CONTEXT_MAX_COMPLETED_TASKS = int(os.environ.get('CONTEXT_MAX_COMPLETED_TASKS', '100000'))
+CONTEXT_COMPLETED_TASK_TTL = float(os.environ['CONTEXT_COMPLETED_TASK_TTL']) if 'CONTEXT_COMPLETED_TASK_TTL' in os.environ else None
+CONTEXT_AUTOSCALE_INTERVAL = float(os.environ.get('CONTEXT_AUTOSCALE_INTERVAL', '1.0'))
+CONTEXT_MIN_AGENTS = int(os.environ.get('CONTEXT_MIN_AGENTS', '1'))
+CONTEXT_MAX_AGENTS = int(os.environ.get('CONTEXT_MAX_AGENTS', '16'))
+CONTEXT_SERVER = os.environ.get('CONTEXT_SERVER', 'development')
+CONTEXT_HTTP_WORKERS = int(os.environ.get('CONTEXT_HTTP_WORKERS', str(os.cpu_count() or 1)))
+CONTEXT_HTTP_THREADS = int(os.environ.get('CONTEXT_HTTP_THREADS', '4'))
+CONTEXT_SWARM_ADDRESS = parse_address(os.environ.get('CONTEXT_SWARM_ADDRESS') or os.path.join(tempfile.gettempdir(), f'byoai-swarm-{os.getpid()}.sock'))
+CONTEXT_SWARM_AUTHKEY = os.environ.get('CONTEXT_SWARM_AUTHKEY', '').encode() or os.urandom(16)
+CONTEXT_NODE_ID = os.environ.get('CONTEXT_NODE_ID', 'node-0')
+CONTEXT_PEERS = os.environ.get('CONTEXT_PEERS', '')
+CONTEXT_PULL_INTERVAL = float(os.environ.get('CONTEXT_PULL_INTERVAL', '1.0'))
+CONTEXT_WORKFLOW_POLL_INTERVAL = float(os.environ.get('CONTEXT_WORKFLOW_POLL_INTERVAL', '2.0'))
+CONTEXT_RESULT_CACHE_SIZE = int(os.environ.get('CONTEXT_RESULT_CACHE_SIZE', '0'))
+CONTEXT_RESULT_CACHE_TTL = float(os.environ['CONTEXT_RESULT_CACHE_TTL']) if 'CONTEXT_RESULT_CACHE_TTL' in os.environ else 3600.0
+CONTEXT_SNAPSHOT_INTERVAL = float(os.environ.get('CONTEXT_SNAPSHOT_INTERVAL', '0.1'))
+CONTEXT_QUEUE_CAPACITY = int(os.environ.get('CONTEXT_QUEUE_CAPACITY', '100000')) or None
+CONTEXT_QUEUE_CAPACITIES = {None if k == 'unspecialized' else k: int(v) for k, _, v in (e.partition('=') for e in os.environ.get('CONTEXT_QUEUE_CAPACITIES', '').split(',') if e)}
+CONTEXT_CLIENT_RATE = float(os.environ.get('CONTEXT_CLIENT_RATE', '0')) or None
+CONTEXT_CLIENT_BURST = float(os.environ.get('CONTEXT_CLIENT_BURST', '0')) or None
+CONTEXT_RETRY_AFTER = float(os.environ.get('CONTEXT_RETRY_AFTER', '1.0'))
+CONTEXT_SCHEDULING_POLICY = os.environ.get('CONTEXT_SCHEDULING_POLICY', 'priority')
+CONTEXT_AGING_RATE = float(os.environ.get('CONTEXT_AGING_RATE', '1.0'))
+CONTEXT_FAIR_SHARE_BY = os.environ.get('CONTEXT_FAIR_SHARE_BY', 'specialization')
+CONTEXT_FAIR_SHARE_WEIGHTS = parse_weights(os.environ.get('CONTEXT_FAIR_SHARE_WEIGHTS', ''))
+CONTEXT_SIMULATED_WORK_MEAN = float(os.environ['CONTEXT_SIMULATED_WORK_MEAN']) if 'CONTEXT_SIMULATED_WORK_MEAN' in os.environ else None
+CONTEXT_SIMULATED_WORK_SEED = int(os.environ.get('CONTEXT_SIMULATED_WORK_SEED', '0'))
+CONTEXT_SNAPSHOT_PATH = os.environ.get('CONTEXT_SNAPSHOT_PATH') or os.path.join(tempfile.gettempdir(), f'byoai-snapshot-{os.getpid()}.log')
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 app = Flask(__name__)
-swarm = SwarmIntegration()
 
-def load_workflow(workflow_file):
+# Sharded when CONTEXT_PEERS lists the nodes of the deployment.
+router = ShardRouter(CONTEXT_NODE_ID, parse_peers(CONTEXT_PEERS)) if CONTEXT_PEERS else None
+
+def create_swarm():
+    return SwarmIntegration(persistence_dir=CONTEXT_PERSISTENCE_DIR,
+                            max_completed=CONTEXT_MAX_COMPLETED_TASKS,
+                            completed_ttl=CONTEXT_COMPLETED_TASK_TTL,
+                            scheduler=CONTEXT_SCHEDULER,
+                            node_index=router.node_index if router else 0,
+                            node_bits=NODE_BITS if router else 0,
+                            result_cache_size=CONTEXT_RESULT_CACHE_SIZE,
+                            result_cache_ttl=CONTEXT_RESULT_CACHE_TTL or None,
+                            snapshot_interval=CONTEXT_SNAPSHOT_INTERVAL,
+                            snapshot_journal=CONTEXT_SNAPSHOT_PATH if CONTEXT_SERVER == 'production' else None,
+                            queue_capacity=CONTEXT_QUEUE_CAPACITY,
+                            queue_capacities=CONTEXT_QUEUE_CAPACITIES,
+                            client_rate=CONTEXT_CLIENT_RATE,
+                            client_burst=CONTEXT_CLIENT_BURST,
+                            retry_after=CONTEXT_RETRY_AFTER,
+                            scheduling_policy=create_policy(CONTEXT_SCHEDULING_POLICY, CONTEXT_AGING_RATE,
+                                                            CONTEXT_FAIR_SHARE_WEIGHTS, CONTEXT_FAIR_SHARE_BY))
+
+# With the reloader, the development server runs in a child process that
+# re-imports this module; the parent only watches for file changes, so it
+# must not open the task log or run agents that race the child's.
+RELOADER_PARENT = (__name__ == "__main__" and CONTEXT_SERVER == 'development'
+                   and os.environ.get('WERKZEUG_RUN_MAIN') != 'true')
+
+# Status and state reads are served from snapshots published at most
+# CONTEXT_SNAPSHOT_INTERVAL seconds ago; in production each HTTP worker tails
+# the store process's snapshot journal instead of asking the store.
+if CONTEXT_SERVER == 'production':
+    # HTTP workers all talk to the one swarm in the store process.
+    swarm = SwarmClient(CONTEXT_SWARM_ADDRESS, CONTEXT_SWARM_AUTHKEY)
+    snapshot = SnapshotReader(CONTEXT_SNAPSHOT_PATH, CONTEXT_SNAPSHOT_INTERVAL / 2) if CONTEXT_SNAPSHOT_INTERVAL else None
+elif RELOADER_PARENT:
+    swarm = None
+    snapshot = None
+else:
+    swarm = create_swarm()
+    snapshot = swarm.snapshot
+
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+def parse_workflow(workflow_file, data):
     try:
-        with open(os.path.join(CONTEXT_WORKFLOW_DIR, workflow_file), 'r') as f:
-            return yaml.safe_load(f)
-    except FileNotFoundError:
-        logging.error(f"Workflow file not found: {workflow_file}")
-        return None
+        return yaml.load(data, Loader=YAML_LOADER)
     except yaml.YAMLError as e:
         logging.error(f"Error parsing workflow file {workflow_file}: {str(e)}")
         return None
 
-def execute_workflow(workflow):
+# Without a persistence dir pending tasks do not survive a restart, so
+# neither should the record of which workflow steps were enqueued.
+workflow_cache = WorkflowCache(CONTEXT_WORKFLOW_DIR, parse_workflow,
+                               os.path.join(CONTEXT_PERSISTENCE_DIR, 'workflow_state.json')
+                               if CONTEXT_PERSISTENCE_DIR and not RELOADER_PARENT else None)
+
+def load_workflow(workflow_file):
+    return workflow_cache.get(workflow_file)
+
+def execute_workflow(workflow, steps=None):
+    # Returns the steps that were enqueued.
     if not workflow:
-        return
-    for step in workflow['steps']:
-        priority = step.get('priority', 5)
-        specialization = step.get('specialization')
-        task_id = swarm.add_task(step['name'], priority=priority, specialization=specialization)
-        logging.info(f"Added task from workflow: {step['name']} (ID: {task_id})")
+        return []
+    steps = workflow['steps'] if steps is None else steps
+    task_ids = swarm.add_tasks({
+        'description': step['name'],
+        'priority': step.get('priority', 5),
+        'specialization': step.get('specialization')
+    } for step in steps)
+    logging.info(f"Added {len(task_ids)} tasks from workflow: {workflow['name']} (IDs: {task_ids})")
+    if None in task_ids:
+        logging.warning(f"{task_ids.count(None)} steps of workflow {workflow['name']} were refused: queue full")
+    return [step for step, task_id in zip(steps, task_ids) if task_id is not None]
 
 def monitor_and_scale_agents():
+    # Per-specialization agent counts follow arrival rate, backlog and
+    # measured service time; CONTEXT_MIN/MAX_AGENTS bound each specialization.
+    autoscaler = Autoscaler(min_agents=CONTEXT_MIN_AGENTS, max_agents=CONTEXT_MAX_AGENTS)
     while True:
-        swarm_state = swarm.get_swarm_state()
-        pending_tasks = swarm_state['pending_tasks']
-        active_agents = swarm_state['active_agents']
-        if pending_tasks > active_agents * 2:  # Scale up if there are more than 2 pending tasks per agent
-            swarm.add_agent()
-            logging.info(f"Scaled up: Added new agent. Total agents: {active_agents + 1}")
-        time.sleep(10)  # Check every 10 seconds
+        try:
+            autoscaler.step(swarm, CONTEXT_AUTOSCALE_INTERVAL)
+        except Exception:
+            logging.exception("Autoscaler step failed")
+        time.sleep(CONTEXT_AUTOSCALE_INTERVAL)
 
 @app.route('/')
 def home():
@@ -55,9 +158,15 @@ def home():
 def status():
     return "BYOAI agent status: OK"
 
+def json_response(body, status=200):
+    return Response(body, status=status, mimetype='application/json')
+
 @app.route('/swarm/state')
 def swarm_state():
-    return jsonify(swarm.get_swarm_state())
+    state = snapshot.swarm_state() if snapshot else None
+    if state is None:
+        return jsonify(swarm.get_swarm_state())
+    return json_response(state)
 
 @app.route('/swarm/add_task', methods=['GET', 'POST'])
 def add_task():
@@ -86,21 +195,206 @@ def add_task():
         if 'description' not in data:
             raise BadRequest("Task description is required")
 
+        if routed():
+            owner = router.owner_of_specialization(data.get('specialization'))
+            if owner != router.node_id:
+                swarm.throttle(client_id())
+                status, payload = router.request(owner, 'POST', '/swarm/add_task', data)
+                return jsonify(payload), status
+
         task_id = swarm.add_task(
             description=data['description'],
             priority=data.get('priority', 5),
             specialization=data.get('specialization'),
-            timeout=data.get('timeout', 30)
+            timeout=data.get('timeout', 30),
+            client=client_id()
         )
+        if CONTEXT_RESULT_CACHE_SIZE:
+            # Retention may already have evicted a task completed from cache.
+            status = swarm.get_task_status(task_id)
+            if status and status['status'] == 'completed':
+                # Identical task already ran: answer with its result at once.
+                return jsonify({"task_id": task_id, "message": "Task completed from cache",
+                                "cached": True, "result": status['result']}), 200
         return jsonify({"task_id": task_id, "message": "Task added successfully"}), 201
 
+def routed():
+    # Requests already forwarded by a peer are always served locally.
+    return router is not None and FORWARDED_HEADER not in request.headers
+
+def client_id():
+    # Rate limits are per client and charged by the node the client talks
+    # to, so tasks forwarded by a peer are not charged again.
+    if FORWARDED_HEADER in request.headers:
+        return None
+    return request.headers.get('X-Client-ID') or request.remote_addr
+
+def add_task_batch(specs):
+    if not routed():
+        return swarm.add_tasks(specs, client=client_id())
+    swarm.throttle(client_id(), len(specs))
+    groups = defaultdict(list)
+    for index, spec in enumerate(specs):
+        groups[router.owner_of_specialization(spec['specialization'])].append(index)
+    task_ids = [None] * len(specs)
+    for owner, indexes in groups.items():
+        owner_specs = [specs[index] for index in indexes]
+        if owner == router.node_id:
+            owner_ids = swarm.add_tasks(owner_specs)
+        else:
+            status, payload = router.request(owner, 'POST', '/swarm/add_tasks', owner_specs)
+            if 'task_ids' not in payload:
+                raise PeerError(f"Node {owner} rejected tasks: {payload.get('error')}")
+            owner_ids = payload['task_ids']
+        for index, task_id in zip(indexes, owner_ids):
+            task_ids[index] = task_id
+    return task_ids
+
+BULK_CHUNK_SIZE = 1000
+STREAM_READ_SIZE = 64 * 1024
+
+def parse_task_spec(data, index):
+    if not isinstance(data, dict) or 'description' not in data:
+        raise BadRequest(f"Task {index}: description is required")
+    return {
+        'description': data['description'],
+        'priority': data.get('priority', 5),
+        'specialization': data.get('specialization'),
+        'timeout': data.get('timeout', 30)
+    }
+
+def iter_body_lines(stream):
+    # Reading fixed-size blocks is much cheaper than readline() on the
+    # request stream.
+    pending = b''
+    while True:
+        block = stream.read(STREAM_READ_SIZE)
+        if not block:
+            break
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+def read_ndjson_tasks():
+    # Parse the request body line by line so large uploads are never held
+    # in memory as a single document.
+    for index, line in enumerate(iter_body_lines(request.stream)):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            raise BadRequest(f"Task {index}: invalid JSON")
+        yield parse_task_spec(data, index)
+
+@app.route('/swarm/add_tasks', methods=['POST'])
+def add_tasks():
+    if request.mimetype == 'application/x-ndjson':
+        # Chunks are enqueued as they arrive, so when the stream stops part
+        # way the response lists the IDs of the tasks already added; the
+        # client resumes after them instead of resending duplicates.
+        task_ids = []
+        batch = []
+        malformed = None
+        try:
+            try:
+                for spec in read_ndjson_tasks():
+                    batch.append(spec)
+                    if len(batch) == BULK_CHUNK_SIZE:
+                        task_ids.extend(add_task_batch(batch))
+                        batch = []
+            except BadRequest as e:
+                # Every task before the malformed line is added.
+                malformed = e
+            if batch:
+                task_ids.extend(add_task_batch(batch))
+        except Rejected as e:
+            response = jsonify({"error": str(e), "retry_after": e.retry_after, "task_ids": task_ids,
+                                "message": f"Added the first {len(task_ids)} tasks before the rate limit"})
+            return response, 429, {'Retry-After': str(math.ceil(e.retry_after))}
+        if malformed is not None:
+            return jsonify({"error": str(malformed), "task_ids": task_ids,
+                            "message": f"Added the {len(task_ids)} tasks before the malformed line"}), 400
+    elif request.is_json:
+        data = request.get_json()
+        if not isinstance(data, list):
+            raise BadRequest("Expected a JSON array of tasks")
+        task_ids = add_task_batch([parse_task_spec(item, index) for index, item in enumerate(data)])
+    else:
+        raise BadRequest("Content-Type must be application/json or application/x-ndjson")
+
+    if not task_ids:
+        raise BadRequest("No tasks in request body")
+    refused = task_ids.count(None)
+    if refused:
+        # Tasks refused for full queues have a null ID; the rest were added.
+        response = jsonify({"task_ids": task_ids, "refused": refused, "retry_after": CONTEXT_RETRY_AFTER,
+                            "message": f"Added {len(task_ids) - refused} tasks, {refused} refused: queue full"})
+        return response, 429, {'Retry-After': str(math.ceil(CONTEXT_RETRY_AFTER))}
+    return jsonify({"task_ids": task_ids, "message": f"Added {len(task_ids)} tasks"}), 201
+
+def local_task_status(task_id):
+    # Tasks too new to be in the snapshot yet come from the swarm itself.
+    status = snapshot.task_status(task_id) if snapshot else None
+    if status is None:
+        status = swarm.get_task_status(task_id)
+        return json.dumps(status, default=str).encode() if status else None
+    return status
+
 @app.route('/swarm/task_status/<int:task_id>')
 def task_status(task_id):
-    status = swarm.get_task_status(task_id)
+    status = None
+    if routed():
+        # Ask the node that allocated the ID, then follow transfers.
+        node = router.owner_of_task(task_id)
+        for _ in range(len(router.nodes)):
+            if node == router.node_id:
+                status = local_task_status(task_id)
+                status = json.loads(status) if status else None
+            elif node in router.urls:
+                code, status = router.request(node, 'GET', f'/swarm/task_status/{task_id}')
+                if code != 200:
+                    return jsonify(status), code
+            if not status or status['status'] != 'transferred':
+                break
+            node = status['assigned_agent']
+    else:
+        status = local_task_status(task_id)
+        if status:
+            return json_response(status)
     if status:
         return jsonify(status), 200
     raise NotFound("Task not found")
 
+@app.route('/swarm/shard/release', methods=['POST'])
+def release_tasks():
+    # Called by an idle peer that wants work; see ShardRouter.pull_work.
+    data = request.get_json()
+    released = swarm.release_tasks(data.get('specializations', []), data.get('max', 1), data['node'],
+                                   data.get('lease', 30.0))
+    return jsonify(released), 200
+
+@app.route('/swarm/shard/ack', methods=['POST'])
+def acknowledge_release():
+    # The pulling peer adopted a lease's tasks; unacknowledged leases expire
+    # and their tasks are requeued here.
+    data = request.get_json()
+    if not data or 'lease' not in data:
+        raise BadRequest("lease is required")
+    return jsonify({"acknowledged": swarm.ack_release(data['lease'])}), 200
+
+# Subscriptions are held open by the asyncio event server in the swarm's
+# process, not by HTTP worker threads; these routes only point clients there.
+@app.route('/swarm/events')
+@app.route('/swarm/wait')
+def task_events():
+    host = request.host.rsplit(':', 1)[0]
+    query = request.query_string.decode()
+    return redirect(f"{request.scheme}://{host}:{CONTEXT_EVENTS_PORT}{request.path}" + (f"?{query}" if query else ''), 307)
+
 @app.route('/swarm/remove_completed_tasks', methods=['POST'])
 def remove_completed_tasks():
     max_completed = request.json.get('max_completed', 100)
@@ -109,7 +403,10 @@ def remove_completed_tasks():
 
 @app.route('/swarm/agent_load')
 def agent_load():
-    return jsonify(swarm.get_swarm_state()['agent_load']), 200
+    load = snapshot.agent_load() if snapshot else None
+    if load is None:
+        return jsonify(swarm.get_swarm_state()['agent_load']), 200
+    return json_response(load)
 
 @app.route('/swarm/redistribute_tasks', methods=['POST'])
 def redistribute_tasks():
@@ -121,6 +418,10 @@ def redistribute_tasks():
 def swarm_statistics():
     return jsonify(swarm.get_swarm_statistics()), 200
 
+@app.route('/metrics')
+def metrics():
+    return Response(swarm.render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/agents/scale', methods=['POST'])
 def scale_agents():
     data = request.get_json()
@@ -145,32 +446,73 @@ def handle_bad_request(e):
 def handle_not_found(e):
     return jsonify({"error": str(e)}), 404
 
+@app.errorhandler(Rejected)
+def handle_rejected(e):
+    return jsonify({"error": str(e), "retry_after": e.retry_after}), 429, {'Retry-After': str(math.ceil(e.retry_after))}
+
+@app.errorhandler(PeerError)
+def handle_peer_error(e):
+    logging.error(str(e))
+    return jsonify({"error": str(e)}), 502
+
 @app.errorhandler(Exception)
 def handle_generic_error(e):
     logging.error(f"Unexpected error: {str(e)}")
     return jsonify({"error": "An unexpected error occurred"}), 500
 
-def main():
-    logging.info(f"BYOAI agent running on {CONTEXT_AGENT_HOST}:{CONTEXT_AGENT_PORT}")
-    logging.info(f"Loading workflows from {CONTEXT_WORKFLOW_DIR}")
-    
-    swarm.start(num_agents=5)
+def start_swarm():
+    if CONTEXT_PROCESS_SPECIALIZATIONS:
+        pool = process_pool(CONTEXT_PROCESS_WORKERS)
+        for specialization in CONTEXT_PROCESS_SPECIALIZATIONS:
+            swarm.set_executor(specialization, pool)
+        logging.info(f"Running {', '.join(CONTEXT_PROCESS_SPECIALIZATIONS)} tasks in a process pool")
+
+    if CONTEXT_SIMULATED_WORK_MEAN is not None:
+        # Reproducible task durations for benchmarks (benchmarks/suite.py).
+        swarm.set_default_task_body(DeterministicWork(CONTEXT_SIMULATED_WORK_MEAN, CONTEXT_SIMULATED_WORK_SEED))
+
+    swarm.start(num_agents=5, mode=CONTEXT_AGENT_MODE)
 
     # Start the agent monitoring and scaling thread
     threading.Thread(target=monitor_and_scale_agents, daemon=True).start()
 
-    # Load and execute workflows
-    for workflow_file in os.listdir(CONTEXT_WORKFLOW_DIR):
-        if workflow_file.endswith('.yml'):
-            workflow = load_workflow(workflow_file)
-            if workflow:
-                logging.info(f"Executing workflow: {workflow['name']}")
-                execute_workflow(workflow)
-            else:
-                logging.error(f"Failed to load workflow: {workflow_file}")
-
-    # Start Flask app
-    app.run(host=CONTEXT_AGENT_HOST, port=CONTEXT_AGENT_PORT, debug=True)
+    if router:
+        threading.Thread(target=router.pull_loop, args=(swarm, CONTEXT_PULL_INTERVAL), daemon=True).start()
+        logging.info(f"Node {router.node_id} ({router.node_index + 1} of {len(router.nodes)}) pulling work from peers")
+
+    # Load and execute workflows, then pick up new and edited ones
+    workflow_cache.sync(execute_workflow)
+    threading.Thread(target=workflow_cache.watch, args=(execute_workflow, CONTEXT_WORKFLOW_POLL_INTERVAL),
+                     daemon=True).start()
+
+def start_event_server():
+    EventServer(swarm, swarm.swarm.events).start(CONTEXT_AGENT_HOST, CONTEXT_EVENTS_PORT)
+
+def run_swarm_store():
+    # Runs in the forked store process, where the real swarm lives.
+    global swarm
+    swarm = create_swarm()
+    start_swarm()
+    start_event_server()
+    serve_swarm(swarm, CONTEXT_SWARM_ADDRESS, CONTEXT_SWARM_AUTHKEY)
+
+def main():
+    logging.info(f"BYOAI agent running on {CONTEXT_AGENT_HOST}:{CONTEXT_AGENT_PORT}")
+    logging.info(f"Loading workflows from {CONTEXT_WORKFLOW_DIR}")
+
+    if CONTEXT_SERVER == 'production':
+        start_store_process(run_swarm_store)
+        swarm.connect()
+        logging.info(f"Serving with {CONTEXT_HTTP_WORKERS} gunicorn workers x {CONTEXT_HTTP_THREADS} threads")
+        run_http_server(app, CONTEXT_AGENT_HOST, CONTEXT_AGENT_PORT, CONTEXT_HTTP_WORKERS, CONTEXT_HTTP_THREADS)
+    else:
+        # With the reloader only the child process runs the swarm and serves
+        # requests.
+        if not RELOADER_PARENT:
+            start_swarm()
+            start_event_server()
+        # Start Flask app
+        app.run(host=CONTEXT_AGENT_HOST, port=CONTEXT_AGENT_PORT, debug=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
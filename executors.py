@@ -0,0 +1,65 @@
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+class SimulatedWork:
+    """Default task body: sleeps for a random time within a range."""
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def duration(self, payload):
+        return random.uniform(self.low, self.high)
+
+    def __call__(self, payload):
+        time.sleep(self.duration(payload))
+        return None
+
+
+class DeterministicWork:
+    """Task body whose run time depends only on the task, for benchmarks.
+
+    Durations are exponentially distributed around `mean` seconds, scaled
+    by an optional per-specialization factor, and drawn from a generator
+    seeded with (seed, task ID), so replaying a trace reproduces every
+    task's duration.
+    """
+
+    def __init__(self, mean, seed=0, factors=None):
+        self.mean = mean
+        self.seed = seed
+        self.factors = dict(factors or {})
+
+    def duration(self, payload):
+        task_id, _, specialization = payload
+        if not self.mean:
+            return 0.0
+        rng = random.Random(self.seed * 1_000_003 + task_id)
+        return rng.expovariate(1 / self.mean) * self.factors.get(specialization, 1.0)
+
+    def __call__(self, payload):
+        time.sleep(self.duration(payload))
+        return None
+
+
+def task_payload(task):
+    # Only the fields a task body needs. A short tuple pickles much cheaper
+    # than the Task object with its bookkeeping attributes.
+    return (task.task_id, task.description, task.specialization)
+
+
+def run_timed(body, payload):
+    # Runs in the worker, so the reported time excludes pool queueing and
+    # payload transfer.
+    start = time.perf_counter()
+    result = body(payload)
+    return result, time.perf_counter() - start
+
+
+def process_pool(max_workers=None):
+    # Agents are threads, so forking from them could copy held locks into the
+    # worker; spawn workers from a clean interpreter instead.
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
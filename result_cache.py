@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+HIT = "hit"
+MISS = "miss"
+COALESCED = "coalesced"
+
+
+class ResultCache:
+    """Results of completed tasks keyed by (description, specialization).
+
+    admit() decides what to do with a new task: a cached result that has not
+    outlived `ttl` is a hit; a task identical to one already queued or
+    running is coalesced and waits for that task's outcome; anything else is
+    a miss and runs. Entries are evicted least recently used beyond
+    `max_entries`.
+    """
+
+    def __init__(self, max_entries=10_000, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        # key -> duplicate tasks waiting on the task that is running it
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def admit(self, task):
+        # Returns (outcome, cached result).
+        key = (task.description, task.specialization)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                result, stored = entry
+                if self.ttl is None or time.monotonic() - stored < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return HIT, result
+                del self.entries[key]
+            waiting = self.in_flight.get(key)
+            if waiting is not None:
+                waiting.append(task)
+                self.coalesced += 1
+                return COALESCED, None
+            self.in_flight[key] = []
+            self.misses += 1
+            return MISS, None
+
+    def peek(self, description, specialization):
+        # The outcome admit() would give, without counting or registering it.
+        key = (description, specialization)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[1] < self.ttl):
+                return HIT
+            return COALESCED if key in self.in_flight else MISS
+
+    def complete(self, task, result):
+        # Caches the result; returns the duplicates that were waiting for it.
+        key = (task.description, task.specialization)
+        with self.lock:
+            self.entries[key] = (result, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return self.in_flight.pop(key, [])
+
+    def abandon(self, task):
+        # The task ended without a result; returns its waiting duplicates.
+        with self.lock:
+            return self.in_flight.pop((task.description, task.specialization), [])
+
+    def hand_over(self, task):
+        # The task is leaving this node: the first waiting duplicate takes
+        # its place and is returned so it can be enqueued.
+        key = (task.description, task.specialization)
+        with self.lock:
+            waiting = self.in_flight.pop(key, [])
+            if not waiting:
+                return None
+            self.in_flight[key] = waiting[1:]
+            return waiting[0]
+
+    def snapshot(self):
+        with self.lock:
+            admitted = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": self.hits / admitted if admitted else 0.0,
+                "miss_rate": self.misses / admitted if admitted else 0.0,
+                "coalescing_rate": self.coalesced / admitted if admitted else 0.0,
+            }
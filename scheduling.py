@@ -0,0 +1,83 @@
+class StrictPriority:
+    """Highest priority first; FIFO among tasks of equal priority."""
+
+    def key(self, task, seq):
+        return (-task.priority, seq)
+
+    def claimed(self, entry):
+        pass
+
+
+class Aging:
+    """Priority that rises by `rate` for every second a task waits.
+
+    A task's effective priority at time t is priority + rate * (t -
+    enqueue_time). Comparing two tasks at the same t cancels t out, so the
+    heap key rate * enqueue_time - priority never needs updating.
+    """
+
+    def __init__(self, rate=1.0):
+        self.rate = rate
+
+    def key(self, task, seq):
+        return (self.rate * task.enqueue_time - task.priority, seq)
+
+    def claimed(self, entry):
+        pass
+
+
+class WeightedFairQueuing:
+    """Self-clocked weighted fair queuing over flows of tasks.
+
+    A flow is the tasks sharing a specialization, or a tenant (the client
+    that submitted them) with flow="tenant". Each task gets a virtual
+    finish tag one 1/weight step after the later of its flow's previous tag
+    and the virtual time, which is the tag of the last claimed task, and
+    the smallest tag runs first. Busy flows thus share claims in proportion
+    to their weights and an idle flow cannot bank credit. Within a flow
+    tasks run in arrival order.
+    """
+
+    def __init__(self, weights=None, flow="specialization", default_weight=1.0):
+        if flow not in ("specialization", "tenant"):
+            raise ValueError(f"Unknown fair queuing flow: {flow}")
+        self.weights = dict(weights or {})
+        self.flow = flow
+        self.default_weight = default_weight
+        self.finish = {}
+        self.virtual_time = 0.0
+        self.prune_at = 1024
+
+    def key(self, task, seq):
+        flow = getattr(task, self.flow)
+        start = max(self.virtual_time, self.finish.get(flow, 0.0))
+        tag = self.finish[flow] = start + 1.0 / self.weights.get(flow, self.default_weight)
+        return (tag, seq)
+
+    def claimed(self, entry):
+        self.virtual_time = max(self.virtual_time, entry[0])
+        if len(self.finish) > self.prune_at:
+            # Flows whose last tag the virtual time has passed start over
+            # from the virtual time anyway.
+            self.finish = {flow: tag for flow, tag in self.finish.items() if tag > self.virtual_time}
+            self.prune_at = max(1024, 2 * len(self.finish))
+
+
+def parse_weights(value):
+    # "math=2,language=1"; "unspecialized" names tasks without one.
+    weights = {}
+    for entry in value.split(","):
+        if entry.strip():
+            name, _, weight = entry.strip().partition("=")
+            weights[None if name == "unspecialized" else name] = float(weight)
+    return weights
+
+
+def create_policy(name, aging_rate=1.0, weights=None, flow="specialization"):
+    if name == "priority":
+        return StrictPriority()
+    if name == "aging":
+        return Aging(aging_rate)
+    if name == "fair":
+        return WeightedFairQueuing(weights, flow)
+    raise ValueError(f"Unknown scheduling policy: {name}")
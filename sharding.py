@@ -0,0 +1,139 @@
+import bisect
+import hashlib
+import json
+import logging
+import time
+import urllib.error
+import urllib.request
+
+# Task IDs are (per-node counter << NODE_BITS) | node index, so any node can
+# tell which node allocated an ID without asking.
+NODE_BITS = 10
+FORWARDED_HEADER = "X-Swarm-Forwarded"
+
+
+class PeerError(Exception):
+    pass
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    def __init__(self, nodes, replicas=100):
+        self.points = sorted((_hash(f"{node}#{replica}"), node) for node in nodes for replica in range(replicas))
+        self.keys = [point for point, _ in self.points]
+
+    def node_for(self, key):
+        index = bisect.bisect(self.keys, _hash(key)) % len(self.keys)
+        return self.points[index][1]
+
+
+def parse_peers(value):
+    # "node-0=http://10.0.0.1:8099,node-1=http://10.0.0.2:8099"; the order
+    # fixes each node's index, so every node must be given the same list.
+    peers = []
+    for entry in value.split(","):
+        if entry.strip():
+            node_id, _, url = entry.strip().partition("=")
+            peers.append((node_id, url.rstrip("/")))
+    return peers
+
+
+class ShardRouter:
+    """Routes tasks between the nodes of a sharded deployment.
+
+    Specialized tasks belong to the node their specialization hashes to;
+    unspecialized tasks stay on the node that received them. Status lookups
+    go to the node encoded in the task ID. Nodes with idle agents pull
+    pending tasks from loaded peers. The peer leases the tasks for `lease`
+    seconds and requeues them unless the puller acknowledges adopting them;
+    after the acknowledgement it keeps a "transferred" record pointing at
+    the new owner. An acknowledgement that arrives after the lease expired
+    means the tasks run on both nodes, never on neither.
+    """
+
+    def __init__(self, node_id, peers, timeout=2.0, lease=30.0):
+        self.node_id = node_id
+        self.nodes = [node for node, _ in peers]
+        if node_id not in self.nodes:
+            raise ValueError(f"Node {node_id} is not in the peer list")
+        if len(self.nodes) > 1 << NODE_BITS:
+            raise ValueError(f"At most {1 << NODE_BITS} nodes are supported")
+        self.urls = dict(peers)
+        self.node_index = self.nodes.index(node_id)
+        self.ring = HashRing(self.nodes)
+        self.timeout = timeout
+        self.lease = lease
+        # (node, lease) of adopted tasks whose acknowledgement failed.
+        self.unacked = []
+
+    def owner_of_specialization(self, specialization):
+        if specialization is None:
+            return self.node_id
+        return self.ring.node_for(specialization)
+
+    def owner_of_task(self, task_id):
+        index = task_id & ((1 << NODE_BITS) - 1)
+        return self.nodes[index] if index < len(self.nodes) else None
+
+    def request(self, node, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(self.urls[node] + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json", FORWARDED_HEADER: self.node_id})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b"{}")
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise PeerError(f"Node {node} unreachable: {e}")
+
+    def acknowledge(self, node, lease):
+        try:
+            status, payload = self.request(node, "POST", "/swarm/shard/ack", {"lease": lease})
+        except PeerError as e:
+            logging.warning(f"{e}; will retry acknowledging lease {lease}")
+            self.unacked.append((node, lease))
+            return
+        if status != 200:
+            logging.warning(f"Node {node} refused acknowledgement of lease {lease}: {payload.get('error')}")
+        elif not payload.get("acknowledged"):
+            logging.warning(f"Lease {lease} from node {node} expired first; its tasks may run twice")
+
+    def pull_work(self, swarm, specializations, capacity):
+        unacked, self.unacked = self.unacked, []
+        for node, lease in unacked:
+            self.acknowledge(node, lease)
+        pulled = 0
+        for node in self.nodes:
+            if node == self.node_id or pulled >= capacity:
+                continue
+            try:
+                status, payload = self.request(node, "POST", "/swarm/shard/release", {
+                    "specializations": specializations, "max": capacity - pulled, "node": self.node_id,
+                    "lease": self.lease})
+            except PeerError as e:
+                # Tasks the peer leased to us anyway go back to its queue
+                # when the lease expires.
+                logging.warning(str(e))
+                continue
+            if status == 200 and payload.get("tasks"):
+                pulled += swarm.adopt_tasks(payload["tasks"])
+                self.acknowledge(node, payload["lease"])
+                logging.info(f"Pulled {len(payload['tasks'])} tasks from node {node}")
+        return pulled
+
+    def pull_loop(self, swarm, interval=1.0):
+        # Runs next to the real SwarmIntegration. Capacity is the number of
+        # parked agents not already covered by local backlog.
+        while True:
+            time.sleep(interval)
+            idle = list(swarm.swarm.idle_agents.values())
+            capacity = len(idle) - swarm.pending_tasks_count()
+            if capacity > 0:
+                specializations = sorted({s for specs, _ in idle for s in specs})
+                self.pull_work(swarm, specializations, capacity)
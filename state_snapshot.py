@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+
+def _dumps(value):
+    return json.dumps(value, default=str).encode()
+
+
+class SnapshotPublisher:
+    """Publishes swarm state and task statuses for lock-free reads.
+
+    Writers only append tasks whose status changed to `changed`. Every
+    `interval` seconds a publisher thread renders each changed task's status
+    and the swarm state to JSON once and swaps the results in, so readers get
+    ready-made bytes from a dict lookup or attribute read, without locks or
+    per-request copies, at most `interval` seconds old. With a journal_path
+    the same records are appended to a file that SnapshotReader tails in
+    other processes.
+    """
+
+    def __init__(self, swarm, interval=0.1, journal_path=None, max_journal_bytes=64 * 1024 * 1024):
+        self.swarm = swarm
+        self.interval = interval
+        self.journal_path = journal_path
+        self.max_journal_bytes = max_journal_bytes
+        self.changed = deque()
+        self.statuses = {}
+        self.state = None
+        self.agent_load_json = None
+        self.journal = None
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        # Tasks recovered from the task log predate the change feed.
+        for task_id in list(self.swarm.task_map):
+            status = self.swarm.get_task_status(task_id)
+            if status:
+                self.statuses[task_id] = _dumps(status)
+        if self.journal_path:
+            self._rewrite_journal()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+
+    def task_status(self, task_id):
+        return self.statuses.get(task_id)
+
+    def swarm_state(self):
+        return self.state
+
+    def agent_load(self):
+        return self.agent_load_json
+
+    def _run(self):
+        while self.running:
+            time.sleep(self.interval)
+            try:
+                self.publish()
+            except Exception:
+                logging.exception("Publishing swarm snapshot failed")
+
+    def publish(self):
+        updates = {}
+        while True:
+            try:
+                task = self.changed.popleft()
+            except IndexError:
+                break
+            updates[task.task_id] = task
+        lines = []
+        for task_id, task in updates.items():
+            status = self.swarm.get_task_status(task_id) if self.swarm.task_map.get(task_id) is task else None
+            if status:
+                status = self.statuses[task_id] = _dumps(status)
+                lines.append(b"T %d %s\n" % (task_id, status))
+            elif self.statuses.pop(task_id, None) is not None:
+                lines.append(b"D %d\n" % task_id)
+        state = self.swarm.get_swarm_state()
+        self.state = _dumps(state)
+        self.agent_load_json = _dumps(state["agent_load"])
+        if self.journal:
+            lines.append(b"S %s\n" % self.state)
+            lines.append(b"L %s\n" % self.agent_load_json)
+            self.journal.write(b"".join(lines))
+            self.journal.flush()
+            if self.journal.tell() > self.max_journal_bytes:
+                self._rewrite_journal()
+
+    def _rewrite_journal(self):
+        # Compacts the journal to one record per live task. Readers notice
+        # the new inode and reload from the start.
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for task_id, status in list(self.statuses.items()):
+                f.write(b"T %d %s\n" % (task_id, status))
+            if self.state:
+                f.write(b"S %s\nL %s\n" % (self.state, self.agent_load_json))
+        os.replace(tmp_path, self.journal_path)
+        if self.journal:
+            self.journal.close()
+        self.journal = open(self.journal_path, "ab")
+
+
+class SnapshotReader:
+    """Read side of a SnapshotPublisher journal, for other processes.
+
+    Each process tails the journal into its own dicts, checking for new
+    records at most every `interval` seconds; only the thread that does the
+    check touches the file, everyone else reads the current dicts.
+    """
+
+    def __init__(self, path, interval=0.05):
+        self.path = path
+        self.interval = interval
+        self.statuses = {}
+        self.state = None
+        self.agent_load_json = None
+        self.pid = None
+        self.fd = None
+        self.inode = None
+        self.offset = 0
+        self.pending = b""
+        self.checked = 0.0
+        self.lock = threading.Lock()
+
+    def task_status(self, task_id):
+        self.refresh()
+        return self.statuses.get(task_id)
+
+    def swarm_state(self):
+        self.refresh()
+        return self.state
+
+    def agent_load(self):
+        self.refresh()
+        return self.agent_load_json
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self.checked < self.interval or not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.checked = now
+            self._catch_up()
+        except OSError:
+            pass
+        finally:
+            self.lock.release()
+
+    def _catch_up(self):
+        inode = os.stat(self.path).st_ino
+        if self.pid != os.getpid() or inode != self.inode:
+            # First use in this process, or the journal was compacted.
+            if self.fd is not None and self.pid == os.getpid():
+                os.close(self.fd)
+            self.fd = os.open(self.path, os.O_RDONLY)
+            self.pid = os.getpid()
+            self.inode = os.fstat(self.fd).st_ino
+            self.offset = 0
+            self.pending = b""
+            statuses = {}
+        else:
+            statuses = self.statuses
+        while True:
+            block = os.pread(self.fd, 1 << 20, self.offset)
+            if not block:
+                break
+            self.offset += len(block)
+            lines = (self.pending + block).split(b"\n")
+            self.pending = lines.pop()
+            for line in lines:
+                kind = line[:1]
+                if kind == b"T":
+                    _, task_id, status = line.split(b" ", 2)
+                    statuses[int(task_id)] = status
+                elif kind == b"D":
+                    statuses.pop(int(line[2:]), None)
+                elif kind == b"S":
+                    self.state = line[2:]
+                elif kind == b"L":
+                    self.agent_load_json = line[2:]
+        self.statuses = statuses
@@ -1,141 +1,902 @@
+import asyncio
+import gc
 import threading
 import time
+import uuid
 import random
 import logging
-from queue import PriorityQueue
-from collections import defaultdict
+import sys
+from collections import defaultdict, deque
+from task_store import TaskStore
+from metrics import SwarmMetrics
+from executors import DeterministicWork, SimulatedWork, run_timed, task_payload
+from task_log import TaskLog
+from swarm_stats import SwarmStatistics
+from timeouts import TimeoutReaper
+from work_stealing import WorkStealingScheduler
+from result_cache import ResultCache, HIT, COALESCED, MISS
+from state_snapshot import SnapshotPublisher
+from task_events import EventBus
+from admission import AdmissionController, Rejected
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class Task:
-    def __init__(self, task_id, description, priority=0, specialization=None, timeout=30):
+    # Millions of tasks can be alive at once, so no per-instance __dict__.
+    __slots__ = ("task_id", "description", "priority", "specialization", "status", "start_time",
+                 "completion_time", "assigned_agent", "timeout", "enqueue_time", "result", "attempts", "retries",
+                 "tenant")
+
+    def __init__(self, task_id, description, priority=0, specialization=None, timeout=30, tenant=None):
         self.task_id = task_id
-        self.description = description
+        # Workflows and retries submit the same strings over and over;
+        # interning keeps one copy of each.
+        self.description = sys.intern(description) if type(description) is str else description
         self.priority = priority
-        self.specialization = specialization
+        self.specialization = sys.intern(specialization) if type(specialization) is str else specialization
         self.status = "pending"
         self.start_time = None
         self.completion_time = None
         self.assigned_agent = None
         self.timeout = timeout
+        self.enqueue_time = None
+        self.result = None
+        self.attempts = 0
+        self.retries = 0
+        # The client that submitted the task, for fair queuing by tenant.
+        self.tenant = tenant
 
     def __lt__(self, other):
-        return self.priority > other.priority
+        # Higher priority first, then lower (earlier) ID.
+        return self.priority > other.priority or (self.priority == other.priority and self.task_id < other.task_id)
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
 
 class Swarm:
-    def __init__(self):
-        self.tasks = PriorityQueue()
+    def __init__(self, policy=None):
+        # policy: the order pending tasks are claimed in; see scheduling.py.
+        self.tasks = TaskStore(policy)
         self.agents = {}
         self.lock = threading.Lock()
+        # Idle agents parked in get_task, indexed by what they can run so a new
+        # task only wakes an agent that is able to claim it.
+        self.idle_agents = {}
+        self.idle_by_specialization = defaultdict(dict)
+        self.conditions = {}
+        self.metrics = SwarmMetrics()
+        self.metrics.observe_queue_depth(self.queue_depths)
+        self.claim_latency = self.metrics.queue_wait
+        # Completed, failed and timed out tasks are published here for the
+        # /swarm/events and /swarm/wait subscribers.
+        self.events = EventBus()
 
     def add_task(self, task):
         with self.lock:
-            self.tasks.put(task)
+            self._enqueue(task)
+        self.metrics.enqueued.inc()
 
-    def get_task(self, agent_id, specializations):
+    def add_tasks(self, tasks):
         with self.lock:
-            for _ in range(self.tasks.qsize()):
-                task = self.tasks.get()
-                if task.specialization is None or task.specialization in specializations:
-                    task.assigned_agent = agent_id
-                    task.status = "in_progress"
-                    task.start_time = time.time()
-                    return task
-                self.tasks.put(task)
-        return None
+            for task in tasks:
+                self._enqueue(task)
+        self.metrics.enqueued.inc(len(tasks))
+
+    def load_tasks(self, tasks):
+        with self.lock:
+            now = time.time()
+            for task in tasks:
+                task.enqueue_time = now
+            self.tasks.load(tasks)
+
+    def _enqueue(self, task):
+        task.enqueue_time = time.time()
+        self.tasks.put(task)
+        self._wake_one(task.specialization)
+
+    def _wake_one(self, specialization):
+        waiting = self.idle_agents if specialization is None else self.idle_by_specialization.get(specialization)
+        if not waiting:
+            return
+        agent_id = next(iter(waiting))
+        _, wake = self.idle_agents[agent_id]
+        self._unpark(agent_id)
+        wake()
+
+    def _park(self, agent_id, specializations, wake):
+        self.idle_agents[agent_id] = (specializations, wake)
+        for specialization in specializations:
+            self.idle_by_specialization[specialization][agent_id] = None
+
+    def _unpark(self, agent_id):
+        parked = self.idle_agents.pop(agent_id, None)
+        for specialization in parked[0] if parked else ():
+            self.idle_by_specialization[specialization].pop(agent_id, None)
+
+    def _claim(self, agent_id, specializations):
+        task = self.tasks.claim(specializations)
+        if task:
+            self.start_task(task, agent_id)
+        return task
+
+    def start_task(self, task, agent_id):
+        # Called under the lock for tasks claimed from the store, or without
+        # it for tasks the agent already owns exclusively (work-stealing
+        # local queues).
+        task.assigned_agent = agent_id
+        task.status = "in_progress"
+        task.attempts += 1
+        task.start_time = time.time()
+        self.claim_latency.observe(task.start_time - task.enqueue_time)
+        self.metrics.claimed.inc()
+
+    def take_tasks(self, agent_id, specializations, count):
+        # Removes up to count tasks for a work-stealing agent's local queue
+        # in one lock acquisition. They stay pending until started.
+        with self.lock:
+            acquired = time.perf_counter()
+            tasks = []
+            while len(tasks) < count:
+                task = self.tasks.claim(specializations)
+                if task is None:
+                    break
+                task.assigned_agent = agent_id
+                tasks.append(task)
+            self.metrics.get_task_lock_hold.observe(time.perf_counter() - acquired)
+        return tasks
+
+    def wake_idle(self, tasks):
+        if not self.idle_agents:
+            # Unlocked peek. An agent that parks just after it is picked up
+            # again within idle_timeout and steals then.
+            return
+        with self.lock:
+            for task in tasks:
+                self._wake_one(task.specialization)
 
-    def complete_task(self, task, agent_id):
+    def wait_for_task(self, agent_id, specializations, timeout):
+        # Parks like get_task but claims nothing; returns when woken, on
+        # timeout, or straight away if the store already has a match.
         with self.lock:
+            if self.tasks.available(specializations):
+                return
+            condition = self.conditions.get(agent_id)
+            if condition is None:
+                condition = self.conditions[agent_id] = threading.Condition(self.lock)
+            self._park(agent_id, specializations, condition.notify)
+            condition.wait(timeout)
+            self._unpark(agent_id)
+
+    def get_task(self, agent_id, specializations, timeout=None):
+        lock_hold = self.metrics.get_task_lock_hold
+        with self.lock:
+            acquired = time.perf_counter()
+            task = self._claim(agent_id, specializations)
+            if task is None and timeout:
+                condition = self.conditions.get(agent_id)
+                if condition is None:
+                    condition = self.conditions[agent_id] = threading.Condition(self.lock)
+                deadline = time.monotonic() + timeout
+                while task is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._park(agent_id, specializations, condition.notify)
+                    lock_hold.observe(time.perf_counter() - acquired)
+                    condition.wait(remaining)
+                    acquired = time.perf_counter()
+                    self._unpark(agent_id)
+                    task = self._claim(agent_id, specializations)
+            lock_hold.observe(time.perf_counter() - acquired)
+            return task
+
+    async def get_task_async(self, agent_id, specializations, timeout=None):
+        # Same contract as get_task, but parks the coroutine on a future instead
+        # of a thread. The lock is only held for the claim itself, never across
+        # an await.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout else None
+        while True:
+            woken = None
+            with self.lock:
+                acquired = time.perf_counter()
+                task = self._claim(agent_id, specializations)
+                if task is None and deadline is not None:
+                    remaining = deadline - loop.time()
+                    if remaining > 0:
+                        woken = loop.create_future()
+                        self._park(agent_id, specializations,
+                                   lambda: loop.call_soon_threadsafe(_resolve, woken))
+                self.metrics.get_task_lock_hold.observe(time.perf_counter() - acquired)
+            if woken is None:
+                return task
+            try:
+                await asyncio.wait_for(woken, remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self.lock:
+                    self._unpark(agent_id)
+
+    def complete_task(self, task, agent_id, result=None):
+        # Returns False when the agent no longer owns the task, e.g. it was
+        # expired by the timeout reaper while the agent was stuck.
+        with self.lock:
+            if task.status != "in_progress" or task.assigned_agent != agent_id:
+                return False
             task.status = "completed"
+            task.result = result
+            task.completion_time = time.time()
+        self.events.publish(task)
+        return True
+
+    def fail_task(self, task, agent_id):
+        with self.lock:
+            if task.status != "in_progress" or task.assigned_agent != agent_id:
+                return False
+            task.status = "failed"
             task.completion_time = time.time()
+        self.events.publish(task)
+        return True
+
+    def expire_task(self, task, attempt, max_retries):
+        # Takes an in-flight task away from its agent. Returns that agent, or
+        # None if the claim being expired has already finished.
+        with self.lock:
+            if task.status != "in_progress" or task.attempts != attempt:
+                return None
+            agent_id = task.assigned_agent
+            task.assigned_agent = None
+            if task.retries < max_retries:
+                task.retries += 1
+                task.status = "retrying"
+                timed_out = False
+            else:
+                task.status = "timed_out"
+                task.completion_time = time.time()
+                timed_out = True
+        if timed_out:
+            self.events.publish(task)
+        return agent_id
 
     def register_agent(self, agent_id, specializations):
         with self.lock:
             self.agents[agent_id] = specializations
 
+    def unregister_agent(self, agent_id):
+        with self.lock:
+            self.agents.pop(agent_id, None)
+            self.conditions.pop(agent_id, None)
+
     def pending_tasks_count(self):
-        return self.tasks.qsize()
+        return len(self.tasks)
+
+    def queue_depths(self):
+        with self.lock:
+            return self.tasks.depths()
 
     def get_agent_tasks(self, agent_id):
         with self.lock:
-            return [task for task in self.tasks.queue if task.assigned_agent == agent_id]
+            return [task for task in self.tasks if task.assigned_agent == agent_id]
+
+    def make_room(self, wanted, capacity):
+        # wanted: (specialization, priority) of tasks about to be enqueued.
+        # A queue at capacity(specialization) makes room by shedding its
+        # lowest priority pending task when that ranks below the newcomer.
+        # Returns which of them fit and the shed tasks. Nothing is reserved,
+        # so concurrent callers can overshoot a capacity by the number of
+        # adds in flight.
+        admitted = []
+        shed = []
+        queued = defaultdict(int)
+        with self.lock:
+            for specialization, priority in wanted:
+                limit = capacity(specialization)
+                if limit is not None and self.tasks.depth(specialization) + queued[specialization] >= limit:
+                    task = self.tasks.evict_lowest(specialization, priority)
+                    if task is None:
+                        admitted.append(False)
+                        continue
+                    task.status = "shed"
+                    shed.append(task)
+                queued[specialization] += 1
+                admitted.append(True)
+        if shed:
+            self.metrics.shed.inc(len(shed))
+        return admitted, shed
+
+    def release_tasks(self, specializations, count):
+        # Removes up to count of the best pending tasks without starting them.
+        tasks = []
+        with self.lock:
+            while len(tasks) < count:
+                task = self.tasks.claim(specializations)
+                if task is None:
+                    break
+                tasks.append(task)
+        return tasks
 
     def reassign_task(self, task):
         with self.lock:
             task.assigned_agent = None
             task.status = "pending"
-            self.tasks.put(task)
+            self._enqueue(task)
+        self.metrics.requeued.inc()
 
 class SwarmIntegration:
-    def __init__(self):
-        self.swarm = Swarm()
+    def __init__(self, persistence_dir=None, max_completed=100_000, completed_ttl=None,
+                 max_retries=3, retry_backoff=1.0, max_retry_backoff=30.0, scheduler="global", prefetch=4,
+                 node_index=0, node_bits=0, result_cache_size=0, result_cache_ttl=None,
+                 snapshot_interval=None, snapshot_journal=None, queue_capacity=None, queue_capacities=None,
+                 client_rate=None, client_burst=None, retry_after=1.0, scheduling_policy=None):
+        self.swarm = Swarm(scheduling_policy)
+        if scheduler not in ("global", "work_stealing"):
+            raise ValueError(f"Unknown scheduler: {scheduler}")
+        # With work stealing each agent prefetches into a local deque and
+        # idle agents steal from busy peers; "global" claims straight from the
+        # shared store.
+        self.scheduler = WorkStealingScheduler(self.swarm, prefetch) if scheduler == "work_stealing" else None
         self.task_counter = 0
+        self.counter_lock = threading.Lock()
+        # In a sharded deployment IDs are (counter << node_bits) | node_index
+        # so they are unique across nodes and name the node that owns them.
+        self.node_index = node_index
+        self.node_bits = node_bits
         self.active_agents = set()
-        self.completed_tasks = []
+        # Agents asked to stop finish their current task and then retire;
+        # workers holds the agents that have a running loop to notice that.
+        self.stopping = set()
+        self.workers = set()
+        # Completed tasks are kept in completion order and evicted from here
+        # and task_map once there are more than max_completed of them or they
+        # are older than completed_ttl seconds.
+        self.completed_tasks = deque()
+        self.max_completed = max_completed
+        self.completed_ttl = completed_ttl
         self.task_map = {}
         self.agent_load = defaultdict(int)
         self.agent_performance = defaultdict(lambda: {"completed": 0, "total_time": 0})
+        self.stats = SwarmStatistics()
         self.start_time = time.time()
         self.agent_counter = 0
+        self.idle_timeout = 1.0
+        self.execution_time_range = (0.5, 2.0)
+        self.mode = "thread"
+        self.loop = None
+        self.executors = {}
+        self.task_bodies = {}
+        self.default_task_body = None
+        # In-flight tasks that outlive Task.timeout are requeued with
+        # exponential backoff up to max_retries times, then marked timed_out.
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.reaper = TimeoutReaper(self._expire_task)
+        # Tasks released to another node and not yet acknowledged, by lease.
+        self.leases = {}
+        # Identical (description, specialization) tasks share one execution:
+        # cached results complete new tasks at once, and duplicates of a
+        # task still in flight wait for its outcome as "coalesced".
+        self.result_cache = ResultCache(result_cache_size, result_cache_ttl) if result_cache_size else None
+        # Bounded pending queues with priority-aware shedding, and per-client
+        # token buckets; add_task raises admission.Rejected past either.
+        self.admission = None
+        if queue_capacity is not None or queue_capacities or client_rate:
+            self.admission = AdmissionController(queue_capacity, queue_capacities, client_rate, client_burst, retry_after)
+        # Status and state readers can be served from snapshots published
+        # every snapshot_interval seconds; `changed` feeds the publisher.
+        self.snapshot = None
+        self.changed = None
+        self.task_log = None
+        if persistence_dir:
+            self.task_log = TaskLog(persistence_dir)
+            self.recover()
+            self.task_log.start(self._snapshot_rows)
+        if snapshot_interval:
+            self.snapshot = SnapshotPublisher(self, snapshot_interval, snapshot_journal)
+            self.changed = self.snapshot.changed
+            self.snapshot.start()
+
+    def _allocate_ids(self, count):
+        with self.counter_lock:
+            first_id = self.task_counter + 1
+            self.task_counter += count
+        return range((first_id << self.node_bits) | self.node_index,
+                     ((first_id + count) << self.node_bits) | self.node_index, 1 << self.node_bits)
 
-    def add_task(self, description, priority=0, specialization=None, timeout=30):
-        self.task_counter += 1
-        task = Task(self.task_counter, description, priority, specialization, timeout)
-        self.swarm.add_task(task)
+    def add_task(self, description, priority=0, specialization=None, timeout=30, client=None):
+        if self.admission:
+            self.throttle(client)
+            if not self._make_room([(description, specialization, priority)])[0]:
+                self._record_rejected(1)
+                raise Rejected(f"Queue for {specialization or 'unspecialized'} tasks is full", self.admission.retry_after)
+        task = Task(self._allocate_ids(1)[0], description, priority, specialization, timeout, client)
         self.task_map[task.task_id] = task
+        self.stats.record_submitted(specialization)
+        if self.task_log:
+            self.task_log.append(["a", task.task_id, description, priority, specialization, timeout])
+        if self._admit(task):
+            self.swarm.add_task(task)
+        if self.changed is not None:
+            self.changed.append(task)
         logging.info(f"Added task: {task.description} (Priority: {task.priority}, Specialization: {task.specialization})")
         return task.task_id
 
-    def get_task(self, agent_id):
-        task = self.swarm.get_task(agent_id, self.swarm.agents[agent_id])
+    def add_tasks(self, task_specs, client=None):
+        # task_specs: dicts with the add_task keyword arguments. IDs are
+        # allocated as one block and the batch is enqueued under a single
+        # acquisition of the swarm lock. With admission control, tasks that
+        # don't fit in their queue get None instead of an ID.
+        task_specs = list(task_specs)
+        admitted = None
+        if self.admission:
+            self.throttle(client, len(task_specs))
+            admitted = self._make_room([(spec['description'], spec.get('specialization'), spec.get('priority', 0))
+                                        for spec in task_specs])
+            if not all(admitted):
+                self._record_rejected(admitted.count(False))
+                task_specs = [spec for spec, fits in zip(task_specs, admitted) if fits]
+        tasks = [Task(task_id, spec['description'], spec.get('priority', 0), spec.get('specialization'), spec.get('timeout', 30), client)
+                 for task_id, spec in zip(self._allocate_ids(len(task_specs)), task_specs)]
+        for task in tasks:
+            self.task_map[task.task_id] = task
+        self.stats.record_submitted_batch(tasks)
+        if self.task_log:
+            self.task_log.extend([["a", t.task_id, t.description, t.priority, t.specialization, t.timeout] for t in tasks])
+        self.swarm.add_tasks([task for task in tasks if self._admit(task)] if self.result_cache else tasks)
+        if self.changed is not None:
+            self.changed.extend(tasks)
+        logging.info(f"Added {len(tasks)} tasks in bulk")
+        task_ids = iter([task.task_id for task in tasks])
+        return [next(task_ids) if fits else None for fits in admitted] if admitted else list(task_ids)
+
+    def throttle(self, client, count=1):
+        # Charges a client for tasks, raising admission.Rejected when it is
+        # over its rate. add_task and add_tasks do this themselves.
+        if self.admission and client is not None:
+            try:
+                self.admission.throttle(client, count)
+            except Rejected:
+                self.swarm.metrics.rejected.labels("rate_limited").inc(count)
+                raise
+
+    def _make_room(self, wanted):
+        # wanted: (description, specialization, priority). Only tasks that
+        # will be enqueued take capacity: cache hits, duplicates of a task
+        # in flight and repeats within the batch are admitted as they are.
+        enqueued = []
+        seen = set()
+        for i, (description, specialization, priority) in enumerate(wanted):
+            if self.result_cache:
+                key = (description, specialization)
+                if key in seen or self.result_cache.peek(description, specialization) != MISS:
+                    continue
+                seen.add(key)
+            enqueued.append(i)
+        admitted = [True] * len(wanted)
+        fits, shed = self.swarm.make_room([wanted[i][1:] for i in enqueued], self.admission.capacity)
+        for i, fit in zip(enqueued, fits):
+            admitted[i] = fit
+        if shed:
+            self._shed(shed)
+        return admitted
+
+    def _record_rejected(self, count):
+        self.admission.record_rejected(count)
+        self.swarm.metrics.rejected.labels("queue_full").inc(count)
+
+    def _shed(self, tasks):
+        # Pending tasks dropped for higher priority ones end like transferred
+        # tasks: kept for status lookups until retention evicts them.
+        now = time.time()
+        for task in tasks:
+            task.completion_time = now
+            self.completed_tasks.append(task)
+            self.swarm.events.publish(task)
+            if self.result_cache:
+                for duplicate in self.result_cache.abandon(task):
+                    self._finish_duplicate(duplicate, "shed")
+            logging.warning(f"Shed task {task.task_id} (priority {task.priority}) to admit a higher priority task")
+        if self.changed is not None:
+            self.changed.extend(tasks)
+        if self.task_log:
+            self.task_log.extend([["d", task.task_id, "shed", now] for task in tasks])
+        self.admission.record_shed(len(tasks))
+        self._evict_completed()
+
+    def _admit(self, task):
+        # True when the task has to run; hits and coalesced duplicates don't.
+        if self.result_cache is None:
+            return True
+        outcome, result = self.result_cache.admit(task)
+        if outcome == HIT:
+            self._finish_duplicate(task, "completed", result)
+        elif outcome == COALESCED:
+            task.status = "coalesced"
+        return outcome == MISS
+
+    def _finish_duplicate(self, task, status, result=None):
+        # Settles a task that never ran with the outcome of an identical one.
+        task.status = status
+        task.result = result
+        task.completion_time = time.time()
+        self.swarm.events.publish(task)
+        if self.changed is not None:
+            self.changed.append(task)
+        if self.task_log:
+            self.task_log.append(["d", task.task_id, status, task.completion_time])
+        if status == "completed":
+            self.stats.record_completed(task)
+        else:
+            self.stats.record_failed(task)
+        self._retain(task)
+
+    def _retain(self, task):
+        # Every task that reached a final status is kept for status lookups
+        # until retention evicts it from task_map.
+        self.completed_tasks.append(task)
+        self._evict_completed()
+
+    def recover(self):
+        # Rebuild task_map, completed_tasks and the pending queues from the
+        # task log. Tasks that were in flight when the process died have no
+        # agent any more, so they go back to pending.
+        started = time.time()
+        # Replay allocates millions of long-lived objects; cyclic GC passes
+        # over them would dominate recovery time.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._replay_task_log()
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        logging.info(f"Recovered {len(self.task_map)} tasks ({self.swarm.pending_tasks_count()} pending) from task log in {time.time() - started:.2f}s")
+
+    def _replay_task_log(self):
+        rows, records = self.task_log.replay()
+        tasks = {}
+        for task_id, description, priority, specialization, timeout, status, completion_time in rows:
+            task = tasks[task_id] = Task(task_id, description, priority, specialization, timeout)
+            task.status = status
+            task.completion_time = completion_time
+        for record in records:
+            if record[0] == "a":
+                if record[1] not in tasks:
+                    tasks[record[1]] = Task(*record[1:])
+            else:
+                task = tasks.get(record[1])
+                if task:
+                    task.status = record[2]
+                    task.completion_time = record[3]
+        pending = []
+        completed = []
+        for task_id in sorted(tasks):
+            task = self.task_map[task_id] = tasks[task_id]
+            self.stats.record_submitted(task.specialization)
+            if task.status == "completed":
+                self.stats.record_completed(task)
+                completed.append(task)
+            elif task.status in ("failed", "timed_out"):
+                self.stats.record_failed(task)
+                completed.append(task)
+            elif task.status in ("transferred", "shed"):
+                completed.append(task)
+            else:
+                task.status = "pending"
+                pending.append(task)
+        completed.sort(key=lambda task: task.completion_time)
+        self.completed_tasks.extend(completed)
+        self._evict_completed()
+        self.swarm.load_tasks(pending)
+        mask = (1 << self.node_bits) - 1
+        own_ids = [task_id >> self.node_bits for task_id in tasks if task_id & mask == self.node_index]
+        self.task_counter = max(self.task_counter, max(own_ids, default=0))
+
+    def _snapshot_rows(self):
+        return [[t.task_id, t.description, t.priority, t.specialization, t.timeout, t.status, t.completion_time]
+                for t in list(self.task_map.values())]
+
+    def release_tasks(self, specializations, count, node, lease=30.0):
+        # Hands pending tasks to another node. A backlog of one task per local
+        # agent is kept. Released tasks are leased to the node until it calls
+        # ack_release; a lease that expires unacknowledged, e.g. because the
+        # response never reached the node, puts its tasks back in the queue.
+        count = min(count, self.swarm.pending_tasks_count() - len(self.active_agents))
+        if count <= 0:
+            return {"lease": None, "tasks": []}
+        tasks = self.swarm.release_tasks(specializations, count)
+        if not tasks:
+            return {"lease": None, "tasks": []}
+        for task in tasks:
+            task.status = "leased"
+            task.assigned_agent = node
+        lease_id = uuid.uuid4().hex
+        self.leases[lease_id] = tasks
+        self.reaper.call_later(lease, self._expire_lease, lease_id)
+        if self.changed is not None:
+            self.changed.extend(tasks)
+        logging.info(f"Leased {len(tasks)} tasks to node {node}")
+        return {"lease": lease_id, "tasks": [[t.task_id, t.description, t.priority, t.specialization, t.timeout]
+                                             for t in tasks]}
+
+    def ack_release(self, lease_id):
+        # The node has adopted the leased tasks: they stay in task_map as
+        # "transferred" with assigned_agent naming it, until retention
+        # evicts them. Returns 0 for a lease that already expired.
+        tasks = self.leases.pop(lease_id, None)
+        if not tasks:
+            return 0
+        now = time.time()
+        for task in tasks:
+            task.status = "transferred"
+            task.completion_time = now
+            self._retain(task)
+            self.swarm.events.publish(task)
+            if self.result_cache:
+                # Duplicates waiting here can't follow the task to another node.
+                successor = self.result_cache.hand_over(task)
+                if successor:
+                    successor.status = "pending"
+                    self.swarm.add_task(successor)
+                    if self.changed is not None:
+                        self.changed.append(successor)
+        if self.changed is not None:
+            self.changed.extend(tasks)
+        if self.task_log:
+            self.task_log.extend([["d", task.task_id, "transferred", now] for task in tasks])
+        logging.info(f"Transferred {len(tasks)} tasks to node {tasks[0].assigned_agent}")
+        return len(tasks)
+
+    def _expire_lease(self, lease_id):
+        tasks = self.leases.pop(lease_id, None)
+        if not tasks:
+            return
+        logging.warning(f"Lease of {len(tasks)} tasks to node {tasks[0].assigned_agent} expired; requeueing them")
+        for task in tasks:
+            self._reassign_task(task)
+
+    def adopt_tasks(self, rows):
+        # Rows from another node's release_tasks; their IDs are kept.
+        tasks = [Task(*row) for row in rows]
+        for task in tasks:
+            self.task_map[task.task_id] = task
+        self.swarm.add_tasks(tasks)
+        self.stats.record_submitted_batch(tasks)
+        if self.changed is not None:
+            self.changed.extend(tasks)
+        if self.task_log:
+            self.task_log.extend([["a"] + list(row) for row in rows])
+        return len(tasks)
+
+    def get_task(self, agent_id, timeout=None):
+        if self.scheduler:
+            task = self.scheduler.get_task(agent_id, timeout)
+        else:
+            task = self.swarm.get_task(agent_id, self.swarm.agents[agent_id], timeout)
+        if task:
+            self.agent_load[agent_id] += 1
+            self.reaper.track(task)
+            if self.changed is not None:
+                self.changed.append(task)
+        return task
+
+    def _expire_task(self, task, attempt):
+        agent_id = self.swarm.expire_task(task, attempt, self.max_retries)
+        if agent_id is None:
+            return
+        if self.changed is not None:
+            self.changed.append(task)
+        self.agent_load[agent_id] -= 1
+        self.swarm.metrics.timed_out.inc()
+        if task.status == "timed_out":
+            if self.task_log:
+                self.task_log.append(["d", task.task_id, task.status, task.completion_time])
+            self._retain(task)
+            if self.result_cache:
+                for duplicate in self.result_cache.abandon(task):
+                    self._finish_duplicate(duplicate, "timed_out")
+            logging.warning(f"Task {task.task_id} timed out on agent {agent_id} after {task.retries} retries")
+            return
+        backoff = min(self.retry_backoff * 2 ** (task.retries - 1), self.max_retry_backoff)
+        logging.warning(f"Task {task.task_id} timed out on agent {agent_id}; retry {task.retries} in {backoff:.2f}s")
+        self.reaper.call_later(backoff, self._reassign_task, task)
+
+    def _reassign_task(self, task):
+        self.swarm.reassign_task(task)
+        if self.changed is not None:
+            self.changed.append(task)
+
+    def complete_task(self, task, agent_id, execution_time, result=None):
+        if not self.swarm.complete_task(task, agent_id, result):
+            logging.warning(f"Discarding late result from agent {agent_id} for task {task.task_id}")
+            return
+        if self.changed is not None:
+            self.changed.append(task)
+        if self.task_log:
+            self.task_log.append(["d", task.task_id, task.status, task.completion_time])
+        self.stats.record_completed(task)
+        self._retain(task)
+        if self.result_cache:
+            for duplicate in self.result_cache.complete(task, result):
+                self._finish_duplicate(duplicate, "completed", result)
+        self.agent_load[agent_id] -= 1
+        self.agent_performance[agent_id]["completed"] += 1
+        self.agent_performance[agent_id]["total_time"] += execution_time
+        metrics = self.swarm.metrics
+        metrics.execution_by_specialization.labels(task.specialization or "unspecialized").observe(execution_time)
+        metrics.execution_by_agent.labels(agent_id).observe(execution_time)
+        logging.info(f"Agent {agent_id} completed task {task.task_id}")
+
+    async def add_task_async(self, description, priority=0, specialization=None, timeout=30):
+        # Enqueueing never waits on anything but the short swarm lock.
+        return self.add_task(description, priority, specialization, timeout)
+
+    async def get_task_async(self, agent_id, timeout=None):
+        task = await self.swarm.get_task_async(agent_id, self.swarm.agents[agent_id], timeout)
         if task:
             self.agent_load[agent_id] += 1
+            self.reaper.track(task)
+            if self.changed is not None:
+                self.changed.append(task)
         return task
 
+    async def complete_task_async(self, task, agent_id, execution_time, result=None):
+        self.complete_task(task, agent_id, execution_time, result)
+
+    def fail_task(self, task, agent_id, error):
+        if not self.swarm.fail_task(task, agent_id):
+            logging.warning(f"Ignoring late failure from agent {agent_id} for task {task.task_id}: {str(error)}")
+            return
+        self.stats.record_failed(task)
+        if self.task_log:
+            self.task_log.append(["d", task.task_id, task.status, task.completion_time])
+        if self.changed is not None:
+            self.changed.append(task)
+        self._retain(task)
+        if self.result_cache:
+            for duplicate in self.result_cache.abandon(task):
+                self._finish_duplicate(duplicate, "failed")
+        self.agent_load[agent_id] -= 1
+        logging.error(f"Agent {agent_id} failed task {task.task_id}: {str(error)}")
+
+    def set_executor(self, specialization, executor):
+        # Tasks of this specialization run on the given concurrent.futures
+        # executor (e.g. a ProcessPoolExecutor for CPU-bound work) instead of
+        # on the agent's own thread or event loop.
+        self.executors[specialization] = executor
+
+    def set_task_body(self, specialization, body):
+        self.task_bodies[specialization] = body
+
+    def set_default_task_body(self, body):
+        # Runs tasks without a body of their own, in place of the random
+        # SimulatedWork sleep; e.g. executors.DeterministicWork.
+        self.default_task_body = body
+
+    def _task_body(self, task):
+        return (self.task_bodies.get(task.specialization) or self.default_task_body
+                or SimulatedWork(*self.execution_time_range))
+
+    def execute_task(self, task):
+        executor = self.executors.get(task.specialization)
+        if executor is None:
+            return run_timed(self._task_body(task), task_payload(task))
+        return executor.submit(run_timed, self._task_body(task), task_payload(task)).result()
+
+    async def execute_task_async(self, task):
+        executor = self.executors.get(task.specialization)
+        if executor is not None:
+            return await asyncio.wrap_future(executor.submit(run_timed, self._task_body(task), task_payload(task)))
+        body = self._task_body(task)
+        if not isinstance(body, (SimulatedWork, DeterministicWork)):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, run_timed, body, task_payload(task))
+        # Simulated work sleeps on the event loop rather than in a thread.
+        execution_time = body.duration(task_payload(task))
+        await asyncio.sleep(execution_time)
+        return None, execution_time
+
     def register_agent(self, agent_id, specializations):
         self.swarm.register_agent(agent_id, specializations)
+        if self.scheduler:
+            self.scheduler.register(agent_id, specializations)
         self.active_agents.add(agent_id)
         logging.info(f"Agent {agent_id} registered with specializations: {specializations}")
 
     def agent_worker(self, agent_id):
-        while True:
-            task = self.get_task(agent_id)
+        self.workers.add(agent_id)
+        while agent_id not in self.stopping:
+            task = self.get_task(agent_id, timeout=self.idle_timeout)
             if task:
                 logging.info(f"Agent {agent_id} executing task {task.task_id}: {task.description}")
-                execution_time = random.uniform(0.5, 2.0)
-                time.sleep(execution_time)
-                
-                self.swarm.complete_task(task, agent_id)
-                
-                self.completed_tasks.append(task)
-                self.agent_load[agent_id] -= 1
-                self.agent_performance[agent_id]["completed"] += 1
-                self.agent_performance[agent_id]["total_time"] += execution_time
-                
-                logging.info(f"Agent {agent_id} completed task {task.task_id}")
-            else:
-                time.sleep(0.1)
+                try:
+                    result, execution_time = self.execute_task(task)
+                except Exception as e:
+                    self.fail_task(task, agent_id, e)
+                else:
+                    self.complete_task(task, agent_id, execution_time, result)
+        self._retire_agent(agent_id)
 
-    def start(self, num_agents=5):
+    async def agent_coroutine(self, agent_id):
+        self.workers.add(agent_id)
+        while agent_id not in self.stopping:
+            task = await self.get_task_async(agent_id, timeout=self.idle_timeout)
+            if task:
+                logging.info(f"Agent {agent_id} executing task {task.task_id}: {task.description}")
+                try:
+                    result, execution_time = await self.execute_task_async(task)
+                except Exception as e:
+                    self.fail_task(task, agent_id, e)
+                else:
+                    await self.complete_task_async(task, agent_id, execution_time, result)
+        self._retire_agent(agent_id)
+
+    def start(self, num_agents=5, mode="thread"):
+        if mode not in ("thread", "asyncio"):
+            raise ValueError(f"Unknown agent runtime mode: {mode}")
+        if mode == "asyncio" and self.scheduler:
+            # Coroutine agents share one thread and never contend on the swarm
+            # lock, which is what the local queues exist to avoid.
+            raise ValueError("The work_stealing scheduler runs with thread agents only")
+        self.mode = mode
+        if mode == "asyncio" and self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, daemon=True).start()
         for _ in range(num_agents):
             self.add_agent()
 
-    def add_agent(self):
+    def add_agent(self, specializations=None):
         agent_id = self.agent_counter
         self.agent_counter += 1
-        specializations = random.sample(["math", "language", "image", "audio"], k=random.randint(1, 3))
+        if specializations is None:
+            specializations = random.sample(["math", "language", "image", "audio"], k=random.randint(1, 3))
         self.register_agent(agent_id, specializations)
-        threading.Thread(target=self.agent_worker, args=(agent_id,), daemon=True).start()
+        if self.mode == "asyncio":
+            asyncio.run_coroutine_threadsafe(self.agent_coroutine(agent_id), self.loop)
+        else:
+            threading.Thread(target=self.agent_worker, args=(agent_id,), daemon=True).start()
         logging.info(f"Added new agent {agent_id} with specializations: {specializations}")
         return agent_id
 
+    def remove_agent(self, agent_id):
+        # Graceful: a running agent stops after its current task or idle wait.
+        if agent_id not in self.active_agents or agent_id in self.stopping:
+            return False
+        self.stopping.add(agent_id)
+        if agent_id not in self.workers:
+            self._retire_agent(agent_id)
+        return True
+
+    def _retire_agent(self, agent_id):
+        self.swarm.unregister_agent(agent_id)
+        if self.scheduler:
+            for task in self.scheduler.unregister(agent_id):
+                self._reassign_task(task)
+        self.active_agents.discard(agent_id)
+        self.workers.discard(agent_id)
+        self.stopping.discard(agent_id)
+        # Autoscaled agents never come back under the same ID.
+        self.agent_load.pop(agent_id, None)
+        self.agent_performance.pop(agent_id, None)
+        self.swarm.metrics.execution_by_agent.remove(agent_id)
+        logging.info(f"Agent {agent_id} removed")
+
+    def pending_tasks_count(self):
+        pending = self.swarm.pending_tasks_count()
+        if self.scheduler:
+            pending += sum(len(queue) for queue in list(self.scheduler.queues.values()))
+        return pending
+
     def get_swarm_state(self):
         return {
             "active_agents": len(self.active_agents),
-            "pending_tasks": self.swarm.pending_tasks_count(),
+            "pending_tasks": self.pending_tasks_count(),
             "completed_tasks": len(self.completed_tasks),
             "agent_specializations": dict(self.swarm.agents),
             "agent_load": dict(self.agent_load),
+            "agent_queued": {agent_id: len(queue) for agent_id, queue in list(self.scheduler.queues.items())} if self.scheduler else {},
             "agent_performance": self._calculate_agent_performance()
         }
 
@@ -150,54 +911,94 @@ class SwarmIntegration:
                 "specialization": task.specialization,
                 "assigned_agent": task.assigned_agent,
                 "start_time": task.start_time,
-                "completion_time": task.completion_time
+                "completion_time": task.completion_time,
+                "retries": task.retries,
+                "result": task.result
             }
         return None
 
+    def _evict_completed(self, max_completed=None):
+        if max_completed is None:
+            max_completed = self.max_completed
+        removed = 0
+        while len(self.completed_tasks) > max_completed:
+            try:
+                task = self.completed_tasks.popleft()
+            except IndexError:
+                break
+            self.task_map.pop(task.task_id, None)
+            if self.changed is not None:
+                self.changed.append(task)
+            removed += 1
+        if self.completed_ttl is not None:
+            cutoff = time.time() - self.completed_ttl
+            while self.completed_tasks and self.completed_tasks[0].completion_time < cutoff:
+                try:
+                    task = self.completed_tasks.popleft()
+                except IndexError:
+                    break
+                self.task_map.pop(task.task_id, None)
+                if self.changed is not None:
+                    self.changed.append(task)
+                removed += 1
+        return removed
+
     def remove_completed_tasks(self, max_completed=100):
-        if len(self.completed_tasks) > max_completed:
-            removed_tasks = self.completed_tasks[:-max_completed]
-            self.completed_tasks = self.completed_tasks[-max_completed:]
-            for task in removed_tasks:
-                del self.task_map[task.task_id]
-            logging.info(f"Removed {len(removed_tasks)} completed tasks from history")
+        removed = self._evict_completed(max_completed)
+        if removed:
+            logging.info(f"Removed {removed} completed tasks from history")
 
     def redistribute_tasks(self, threshold=5):
-        overloaded_agents = [agent_id for agent_id, load in self.agent_load.items() if load > threshold]
+        if self.scheduler:
+            # Load is what the agent is running plus what it has queued
+            # locally; the queued part goes back to the shared store.
+            overloaded_agents = [agent_id for agent_id in list(self.scheduler.queues)
+                                 if self.agent_load[agent_id] + self.scheduler.queued(agent_id) > threshold]
+        else:
+            overloaded_agents = [agent_id for agent_id, load in self.agent_load.items() if load > threshold]
         for agent_id in overloaded_agents:
-            tasks_to_redistribute = self.swarm.get_agent_tasks(agent_id)
+            if self.scheduler:
+                tasks_to_redistribute = self.scheduler.drain(agent_id, keep=max(threshold - self.agent_load[agent_id], 0))
+            else:
+                tasks_to_redistribute = self.swarm.get_agent_tasks(agent_id)
+                self.agent_load[agent_id] -= len(tasks_to_redistribute)
             for task in tasks_to_redistribute:
-                self.swarm.reassign_task(task)
-            self.agent_load[agent_id] -= len(tasks_to_redistribute)
+                self._reassign_task(task)
             logging.info(f"Redistributed {len(tasks_to_redistribute)} tasks from overloaded agent {agent_id}")
 
     def get_swarm_statistics(self):
-        total_tasks = len(self.completed_tasks) + self.swarm.pending_tasks_count()
-        avg_completion_time = sum((task.completion_time - task.start_time for task in self.completed_tasks if task.completion_time)) / len(self.completed_tasks) if self.completed_tasks else 0
+        stats = self.stats.snapshot()
         return {
-            "total_tasks_processed": total_tasks,
-            "average_completion_time": avg_completion_time,
-            "tasks_per_specialization": self._count_tasks_per_specialization(),
+            "total_tasks_processed": stats["completed"] + self.pending_tasks_count(),
+            "average_completion_time": stats["average_completion_time"],
+            "tasks_per_specialization": stats["tasks_per_specialization"],
+            "completed_per_specialization": stats["completed_per_specialization"],
+            "failed_tasks": stats["failed"],
+            "completion_time_quantiles": stats["completion_time_quantiles"],
+            "completion_time_quantiles_per_specialization": stats["completion_time_quantiles_per_specialization"],
             "agent_efficiency": self._calculate_agent_efficiency(),
+            "claim_latency": self.get_claim_latency(),
+            "result_cache": self.result_cache.snapshot() if self.result_cache else None,
+            "admission": self.admission.snapshot() if self.admission else None,
             "swarm_uptime": time.time() - self.start_time
         }
 
-    def _count_tasks_per_specialization(self):
-        specialization_count = defaultdict(int)
-        for task in self.completed_tasks + list(self.task_map.values()):
-            specialization_count[task.specialization] += 1
-        return dict(specialization_count)
+    def get_claim_latency(self):
+        return self.swarm.claim_latency.snapshot()
+
+    def render_metrics(self):
+        return self.swarm.metrics.render()
 
     def _calculate_agent_efficiency(self):
         return {agent_id: perf["completed"] / perf["total_time"] if perf["total_time"] > 0 else 0
-                for agent_id, perf in self.agent_performance.items()}
+                for agent_id, perf in list(self.agent_performance.items())}
 
     def _calculate_agent_performance(self):
         return {agent_id: {
             "completed_tasks": perf["completed"],
             "average_task_time": perf["total_time"] / perf["completed"] if perf["completed"] > 0 else 0,
             "efficiency": perf["completed"] / perf["total_time"] if perf["total_time"] > 0 else 0
-        } for agent_id, perf in self.agent_performance.items()}
+        } for agent_id, perf in list(self.agent_performance.items())}
 
 if __name__ == "__main__":
     swarm_integration = SwarmIntegration()
@@ -0,0 +1,101 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+
+class SwarmManager(BaseManager):
+    pass
+
+
+SwarmManager.register("get_swarm")
+
+
+def parse_address(address):
+    # "host:port" for TCP, anything else is a Unix socket path.
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def serve_swarm(swarm, address, authkey):
+    """Serve one SwarmIntegration to HTTP worker processes. Blocks."""
+    SwarmManager.register("get_swarm", callable=lambda: swarm)
+    server = SwarmManager(address=address, authkey=authkey).get_server()
+    logging.info(f"Swarm store listening on {address}")
+    server.serve_forever()
+
+
+def start_store_process(target):
+    # Forked rather than spawned so `target` can be any callable, including
+    # ones defined in the (unimportable) byoai-script module.
+    process = multiprocessing.get_context("fork").Process(target=target, name="swarm-store", daemon=True)
+    process.start()
+    return process
+
+
+class SwarmClient:
+    """Stand-in for SwarmIntegration in HTTP worker processes.
+
+    Attribute access returns methods of a manager proxy for the swarm living
+    in the store process. Each process connects on first use, so a client
+    created before gunicorn forks its workers is safe to share.
+    """
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self.pid = None
+        self.remote = None
+        self.lock = threading.Lock()
+
+    def connect(self, timeout=30.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            manager = SwarmManager(address=self.address, authkey=self.authkey)
+            try:
+                manager.connect()
+                return manager.get_swarm()
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def _remote(self):
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.remote = self.connect()
+                    self.pid = os.getpid()
+        return self.remote
+
+    def __getattr__(self, name):
+        return getattr(self._remote(), name)
+
+
+def run_http_server(app, host, port, workers, threads):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise RuntimeError("Production serving needs gunicorn: pip install gunicorn")
+
+    def post_fork(server, worker):
+        # Workers inherit the store in multiprocessing's registry of child
+        # processes and would try to join it at exit; only the master can.
+        multiprocessing.process._children.clear()
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("post_fork", post_fork)
+
+        def load(self):
+            return app
+
+    Application().run()
@@ -0,0 +1,116 @@
+import math
+import threading
+from collections import defaultdict
+
+UNSPECIALIZED = "unspecialized"
+
+
+class QuantileSketch:
+    """Streaming quantile sketch with bounded relative error.
+
+    Values are counted in logarithmic buckets (as in DDSketch), so any
+    quantile is within `relative_accuracy` of the true value, memory grows
+    with the log of the value range rather than the number of samples, and
+    two sketches merge by adding bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-6):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.buckets = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value < self.min_value:
+            self.zero_count += 1
+        else:
+            self.buckets[math.ceil(math.log(value) / self.log_gamma)] += 1
+
+    def merge(self, other):
+        self.zero_count += other.zero_count
+        self.count += other.count
+        for index, count in other.buckets.items():
+            self.buckets[index] += count
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def quantiles(self):
+        return {"p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99)}
+
+
+class SwarmStatistics:
+    """Running task counters and latency sketches.
+
+    Updated on every add, completion and failure so that reading statistics
+    costs the same whatever the backlog or history size.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.submitted = defaultdict(int)
+        self.completed = defaultdict(int)
+        self.failed = defaultdict(int)
+        self.completion_time_sum = 0.0
+        self.completion_time_count = 0
+        # Claim-to-completion time, per specialization; merged on read.
+        self.completion_times = defaultdict(QuantileSketch)
+
+    def record_submitted(self, specialization, count=1):
+        with self.lock:
+            self.submitted[specialization or UNSPECIALIZED] += count
+
+    def record_submitted_batch(self, tasks):
+        counts = defaultdict(int)
+        for task in tasks:
+            counts[task.specialization or UNSPECIALIZED] += 1
+        with self.lock:
+            for key, count in counts.items():
+                self.submitted[key] += count
+
+    def record_completed(self, task):
+        key = task.specialization or UNSPECIALIZED
+        with self.lock:
+            self.completed[key] += 1
+            if task.start_time and task.completion_time:
+                duration = task.completion_time - task.start_time
+                self.completion_time_sum += duration
+                self.completion_time_count += 1
+                self.completion_times[key].add(duration)
+
+    def record_failed(self, task):
+        with self.lock:
+            self.failed[task.specialization or UNSPECIALIZED] += 1
+
+    def snapshot(self):
+        with self.lock:
+            overall = QuantileSketch()
+            for sketch in self.completion_times.values():
+                overall.merge(sketch)
+            return {
+                "submitted": sum(self.submitted.values()),
+                "completed": sum(self.completed.values()),
+                "failed": sum(self.failed.values()),
+                "average_completion_time": self.completion_time_sum / self.completion_time_count if self.completion_time_count else 0,
+                "tasks_per_specialization": dict(self.submitted),
+                "completed_per_specialization": dict(self.completed),
+                "completion_time_quantiles": overall.quantiles(),
+                "completion_time_quantiles_per_specialization": {
+                    key: sketch.quantiles() for key, sketch in self.completion_times.items()
+                },
+            }
@@ -0,0 +1,233 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+# Statuses after which a task never changes again on this node. Shed tasks
+# were dropped for higher priority ones; transferred tasks continue on the
+# node named by their assigned_agent.
+FINISHED = ("completed", "failed", "timed_out", "shed", "transferred")
+
+
+class EventBus:
+    """Fan-out of task completion events.
+
+    Events are kept in a ring buffer of the last `capacity` events, numbered
+    in publish order. Subscribers hold nothing but the number of the last
+    event they saw, so any number of them cost one notify per publish.
+    """
+
+    def __init__(self, capacity=10_000):
+        self.events = deque(maxlen=capacity)
+        self.last_seq = 0
+        self.lock = threading.Lock()
+        # Called after every publish, e.g. to wake an event loop.
+        self.listeners = []
+
+    def publish(self, task):
+        with self.lock:
+            self.last_seq += 1
+            self.events.append({
+                "seq": self.last_seq,
+                "task_id": task.task_id,
+                "status": task.status,
+                "specialization": task.specialization,
+                "result": task.result,
+                "completion_time": task.completion_time,
+            })
+        for listener in self.listeners:
+            listener()
+
+    def since(self, seq):
+        # Events published after `seq`, oldest first. Walks back from the
+        # newest event, so the cost is the number of events returned. If
+        # more than `capacity` events were published since, only the kept
+        # tail is returned; callers spot the gap from its first seq.
+        with self.lock:
+            events = []
+            for event in reversed(self.events):
+                if event["seq"] <= seq:
+                    break
+                events.append(event)
+        events.reverse()
+        return events
+
+
+def _matches(event, task_ids, specializations):
+    return ((not task_ids or event["task_id"] in task_ids)
+            and (not specializations or event["specialization"] in specializations))
+
+
+class EventServer:
+    """SSE and long-poll endpoints for an EventBus, on one asyncio thread.
+
+    GET /swarm/events streams completion events as Server-Sent Events,
+    filtered by `task_ids` and/or `specialization` (comma separated) and
+    resumable from `Last-Event-ID` or `since`. GET /swarm/wait?task_ids=...
+    &timeout=... answers once every listed task has finished or the timeout
+    passes. Subscribers are coroutines waiting on one shared future that
+    each publish replaces, so thousands of them need no threads.
+    """
+
+    def __init__(self, swarm, bus, heartbeat=15.0, max_wait=300.0):
+        self.swarm = swarm
+        self.bus = bus
+        self.heartbeat = heartbeat
+        self.max_wait = max_wait
+        self.loop = None
+        self.wakeup = None
+        self.wake_scheduled = False
+        self.subscribers = 0
+        self.port = None
+
+    def start(self, host, port):
+        ready = threading.Event()
+        threading.Thread(target=asyncio.run, args=(self._serve(host, port, ready),), daemon=True).start()
+        ready.wait()
+        return self.port
+
+    async def _serve(self, host, port, ready):
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = self.loop.create_future()
+        self.bus.listeners.append(self._on_publish)
+        server = await asyncio.start_server(self._handle, host, port, backlog=4096)
+        self.port = server.sockets[0].getsockname()[1]
+        logging.info(f"Task event stream listening on {host}:{self.port}")
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    def _on_publish(self):
+        # Runs on the publishing thread; at most one wakeup is queued.
+        if not self.wake_scheduled:
+            self.wake_scheduled = True
+            self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        self.wake_scheduled = False
+        wakeup, self.wakeup = self.wakeup, self.loop.create_future()
+        wakeup.set_result(None)
+
+    async def _next_events(self, seq, timeout):
+        events = self.bus.since(seq)
+        if events or timeout <= 0:
+            return events
+        try:
+            await asyncio.wait_for(asyncio.shield(self.wakeup), timeout)
+        except asyncio.TimeoutError:
+            return []
+        return self.bus.since(seq)
+
+    def _finished_statuses(self, task_ids):
+        statuses = {}
+        for task_id in task_ids:
+            status = self.swarm.get_task_status(task_id)
+            if status and status["status"] in FINISHED:
+                statuses[task_id] = status
+        return statuses
+
+    async def _handle(self, reader, writer):
+        self.subscribers += 1
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2 or parts[0] != "GET":
+                await self._respond(writer, 405, {"error": "Only GET is supported"})
+                return
+            url = urlsplit(parts[1])
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                task_ids = {int(i) for i in query.get("task_ids", "").split(",") if i}
+                specializations = {s for s in query.get("specialization", "").split(",") if s}
+                since = int(headers.get("last-event-id") or query.get("since") or 0)
+                timeout = min(float(query.get("timeout", 30)), self.max_wait)
+            except ValueError:
+                await self._respond(writer, 400, {"error": "Invalid query parameters"})
+                return
+            if url.path == "/swarm/events":
+                await self._stream(writer, task_ids, specializations, since)
+            elif url.path == "/swarm/wait":
+                if not task_ids:
+                    await self._respond(writer, 400, {"error": "task_ids is required"})
+                    return
+                await self._wait(writer, task_ids, timeout)
+            else:
+                await self._respond(writer, 404, {"error": "Not found"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.subscribers -= 1
+            writer.close()
+
+    async def _respond(self, writer, status, payload):
+        body = json.dumps(payload, default=str).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}[status]
+        writer.write(b"HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n"
+                     b"Connection: close\r\n\r\n%s" % (status, reason.encode(), len(body), body))
+        await writer.drain()
+
+    async def _wait(self, writer, task_ids, timeout):
+        # Read the cursor before the statuses, so a task finishing in between
+        # shows up as an event rather than being missed.
+        seq = self.bus.last_seq
+        finished = self._finished_statuses(task_ids)
+        deadline = time.monotonic() + timeout
+        while len(finished) < len(task_ids):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            events = await self._next_events(seq, remaining)
+            if events and events[0]["seq"] > seq + 1:
+                # Events fell out of the ring buffer; ask the swarm directly.
+                finished.update(self._finished_statuses(task_ids - set(finished)))
+            for event in events:
+                seq = event["seq"]
+                if event["task_id"] in task_ids:
+                    finished[event["task_id"]] = self.swarm.get_task_status(event["task_id"]) or event
+        await self._respond(writer, 200, {
+            "tasks": list(finished.values()),
+            "pending": sorted(task_ids - set(finished)),
+        })
+
+    async def _stream(self, writer, task_ids, specializations, since):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        seq = since or self.bus.last_seq
+        remaining = set(task_ids)
+        if task_ids and not since:
+            # Listed tasks that already finished are sent up front.
+            for task_id, status in self._finished_statuses(task_ids).items():
+                writer.write(b"id: %d\nevent: task\ndata: %s\n\n" % (seq, json.dumps(status, default=str).encode()))
+                remaining.discard(task_id)
+        await writer.drain()
+        # A stream for a set of tasks ends once all of them have finished.
+        while remaining or not task_ids:
+            events = await self._next_events(seq, self.heartbeat)
+            if not events:
+                writer.write(b": keep-alive\n\n")
+            elif events[0]["seq"] > seq + 1:
+                # Events fell out of the ring buffer. Tell the client which
+                # ones, and send listed tasks that finished among them.
+                missed = {"first_seq": seq + 1, "last_seq": events[0]["seq"] - 1}
+                writer.write(b"id: %d\nevent: gap\ndata: %s\n\n" % (missed["last_seq"], json.dumps(missed).encode()))
+                tail = {event["task_id"] for event in events}
+                for task_id, status in self._finished_statuses(remaining - tail).items():
+                    writer.write(b"id: %d\nevent: task\ndata: %s\n\n" % (missed["last_seq"], json.dumps(status, default=str).encode()))
+                    remaining.discard(task_id)
+            for event in events:
+                seq = event["seq"]
+                if _matches(event, task_ids, specializations):
+                    remaining.discard(event["task_id"])
+                    data = json.dumps({k: v for k, v in event.items() if k != "seq"}, default=str).encode()
+                    writer.write(b"id: %d\nevent: task\ndata: %s\n\n" % (seq, data))
+            await writer.drain()
@@ -0,0 +1,140 @@
+import heapq
+import itertools
+from collections import defaultdict
+from scheduling import StrictPriority
+
+
+class TaskStore:
+    """Pending tasks indexed by specialization.
+
+    Each specialization gets its own priority heap and tasks without a
+    specialization live in a shared heap, so a claim only has to compare the
+    heads of the heaps an agent can serve instead of scanning the backlog.
+    The order comes from a scheduling policy (see scheduling.py), which
+    turns each task into a heap key once, on insert. Not thread-safe on its
+    own; Swarm guards it with its lock.
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy or StrictPriority()
+        self.shared = []
+        self.heaps = {}
+        self.counter = itertools.count()
+        self.size = 0
+        # Live tasks per queue; evicted entries stay in their heap with the
+        # task slot cleared until they surface or the heap is compacted.
+        self.counts = defaultdict(int)
+        # Per queue min-heaps of (priority, -seq, entry) for evict_lowest,
+        # built on its first call.
+        self.victims = None
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for heap in itertools.chain([self.shared], self.heaps.values()):
+            for entry in heap:
+                if entry[-1] is not None:
+                    yield entry[-1]
+
+    def _heap_for(self, specialization):
+        if specialization is None:
+            return self.shared
+        heap = self.heaps.get(specialization)
+        if heap is None:
+            heap = self.heaps[specialization] = []
+        return heap
+
+    def _entry(self, task):
+        # [*policy key, task]; every key ends with the insertion sequence
+        # number, so entries never compare the tasks themselves.
+        return [*self.policy.key(task, next(self.counter)), task]
+
+    def put(self, task):
+        entry = self._entry(task)
+        heapq.heappush(self._heap_for(task.specialization), entry)
+        self.counts[task.specialization] += 1
+        self.size += 1
+        if self.victims is not None:
+            victims = self.victims[task.specialization]
+            heapq.heappush(victims, (task.priority, -entry[-2], entry))
+            if len(victims) > 2 * self.counts[task.specialization] + 64:
+                # Claimed tasks leave their victim entries behind.
+                victims[:] = [victim for victim in victims if victim[2][-1] is not None]
+                heapq.heapify(victims)
+
+    def load(self, tasks):
+        # Bulk insert for recovery: append everything, then heapify each heap
+        # once instead of paying a sift per task.
+        for task in tasks:
+            self._heap_for(task.specialization).append(self._entry(task))
+            self.counts[task.specialization] += 1
+            self.size += 1
+        heapq.heapify(self.shared)
+        for heap in self.heaps.values():
+            heapq.heapify(heap)
+        if self.victims is not None:
+            self.victims = None
+            self._build_victims()
+
+    def _head(self, heap):
+        while heap and heap[0][-1] is None:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def claim(self, specializations):
+        best = self.shared if self._head(self.shared) else None
+        for specialization in specializations:
+            heap = self.heaps.get(specialization)
+            if heap and self._head(heap) and (best is None or heap[0] < best[0]):
+                best = heap
+        if best is None:
+            return None
+        self.size -= 1
+        entry = heapq.heappop(best)
+        task = entry[-1]
+        self.counts[task.specialization] -= 1
+        self.policy.claimed(entry)
+        # Clearing the slot retires the entry's place in the victim heap.
+        entry[-1] = None
+        return task
+
+    def available(self, specializations):
+        return bool(self.counts[None]) or any(self.counts.get(specialization) for specialization in specializations)
+
+    def depth(self, specialization=None):
+        return self.counts.get(specialization, 0)
+
+    def _build_victims(self):
+        self.victims = defaultdict(list)
+        for specialization, heap in itertools.chain([(None, self.shared)], self.heaps.items()):
+            victims = self.victims[specialization] = [(entry[-1].priority, -entry[-2], entry)
+                                                      for entry in heap if entry[-1] is not None]
+            heapq.heapify(victims)
+
+    def evict_lowest(self, specialization, priority):
+        # Removes and returns the lowest priority pending task of one queue,
+        # the newest of equals, if it ranks below `priority`. Policies other
+        # than strict priority don't keep that task at a leaf, so each queue
+        # also has a heap ordered for eviction; both skip removed entries
+        # lazily.
+        if self.victims is None:
+            self._build_victims()
+        victims = self.victims[specialization]
+        while victims and victims[0][2][-1] is None:
+            heapq.heappop(victims)
+        if not victims or victims[0][0] >= priority:
+            return None
+        entry = heapq.heappop(victims)[2]
+        task = entry[-1]
+        entry[-1] = None
+        self.counts[specialization] -= 1
+        self.size -= 1
+        heap = self._heap_for(specialization)
+        if len(heap) > 2 * self.counts[specialization] + 64:
+            heap[:] = [entry for entry in heap if entry[-1] is not None]
+            heapq.heapify(heap)
+        return task
+
+    def depths(self):
+        return {specialization: count for specialization, count in self.counts.items() if count}
@@ -5,13 +5,35 @@ import os
 import json
 import time
 import threading
+import asyncio
+import tempfile
+import shutil
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from swarm_integration import SwarmIntegration, Task
+from executors import DeterministicWork, process_pool
+from swarm_stats import QuantileSketch
+from autoscaler import Autoscaler, burst_trace, simulate
+from swarm_server import SwarmClient, parse_address, serve_swarm, start_store_process
+from sharding import NODE_BITS, HashRing, ShardRouter, parse_peers
+from workflow_cache import WorkflowCache
+from result_cache import ResultCache
+from state_snapshot import SnapshotReader
+from task_events import EventBus, EventServer
+from admission import Rejected
+from task_store import TaskStore
+from scheduling import Aging, WeightedFairQueuing
+import byoai_script
 from byoai_script import app
 
+def shout(payload):
+    return payload[1].upper()
+
+def explode(payload):
+    raise ValueError("boom")
+
 class TestBYOAISwarmIntegration(unittest.TestCase):
 
     def setUp(self):
@@ -97,6 +119,704 @@ class TestBYOAISwarmIntegration(unittest.TestCase):
         self.assertIsNotNone(reassigned_task)
         self.assertEqual(reassigned_task.task_id, task_id)
 
+    def test_get_task_skips_unmatched_specializations(self):
+        self.swarm.add_task("Image Task", priority=10, specialization="image")
+        self.swarm.add_task("Math Task", priority=1, specialization="math")
+        self.swarm.add_task("General Task", priority=5)
+        self.swarm.register_agent(0, ["math"])
+        self.assertEqual(self.swarm.get_task(0).description, "General Task")
+        self.assertEqual(self.swarm.get_task(0).description, "Math Task")
+        self.assertIsNone(self.swarm.get_task(0))
+        self.assertEqual(self.swarm.swarm.pending_tasks_count(), 1)
+
+    def test_idle_agent_woken_by_matching_task(self):
+        self.swarm.register_agent(0, ["math"])
+        claimed = []
+        worker = threading.Thread(target=lambda: claimed.append(self.swarm.get_task(0, timeout=5)))
+        worker.start()
+        time.sleep(0.05)
+        self.swarm.add_task("Language Task", specialization="language")
+        time.sleep(0.05)
+        self.assertEqual(claimed, [])
+        self.assertIn(0, self.swarm.swarm.idle_agents)
+        self.swarm.add_task("Math Task", specialization="math")
+        worker.join(1)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(claimed[0].description, "Math Task")
+        self.assertEqual(self.swarm.get_claim_latency()['count'], 1)
+
+    def test_get_task_async_woken_by_add_task(self):
+        self.swarm.register_agent(0, ["math"])
+
+        async def claim():
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.05, self.swarm.add_task, "Math Task", 1, "math")
+            return await self.swarm.get_task_async(0, timeout=5)
+
+        task = asyncio.run(claim())
+        self.assertEqual(task.description, "Math Task")
+        self.assertEqual(task.status, "in_progress")
+
+    def test_asyncio_mode_completes_tasks(self):
+        self.swarm.execution_time_range = (0, 0.01)
+        self.swarm.start(num_agents=3, mode="asyncio")
+        task_id = self.swarm.add_task("Async Task")
+        deadline = time.time() + 5
+        while self.swarm.get_task_status(task_id)['status'] != 'completed' and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.swarm.get_task_status(task_id)['status'], 'completed')
+        self.assertEqual(len(self.swarm.completed_tasks), 1)
+
+    def test_process_executor_routing(self):
+        pool = process_pool(1)
+        self.addCleanup(pool.shutdown)
+        self.swarm.set_executor("math", pool)
+        self.swarm.set_task_body("math", shout)
+        self.swarm.register_agent(0, ["math"])
+        task_id = self.swarm.add_task("Math Task", specialization="math")
+        task = self.swarm.get_task(0)
+        result, execution_time = self.swarm.execute_task(task)
+        self.swarm.complete_task(task, 0, execution_time, result)
+        self.assertEqual(self.swarm.task_map[task_id].result, "MATH TASK")
+        self.assertEqual(self.swarm.agent_load[0], 0)
+        self.assertEqual(self.swarm.agent_performance[0]["completed"], 1)
+
+    def test_failed_task_body(self):
+        self.swarm.set_task_body("math", explode)
+        self.swarm.register_agent(0, ["math"])
+        task_id = self.swarm.add_task("Math Task", specialization="math")
+        threading.Thread(target=self.swarm.agent_worker, args=(0,), daemon=True).start()
+        deadline = time.time() + 5
+        while self.swarm.get_task_status(task_id)['status'] != 'failed' and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.swarm.get_task_status(task_id)['status'], 'failed')
+        self.assertEqual(self.swarm.agent_load[0], 0)
+
+    def test_add_tasks_bulk(self):
+        first_id = self.swarm.add_task("Single Task")
+        task_ids = self.swarm.add_tasks([
+            {'description': "Bulk Task 1", 'priority': 2, 'specialization': "math"},
+            {'description': "Bulk Task 2", 'priority': 7},
+        ])
+        self.assertEqual(task_ids, [first_id + 1, first_id + 2])
+        self.assertEqual(self.swarm.swarm.pending_tasks_count(), 3)
+        self.swarm.register_agent(0, ["math"])
+        self.assertEqual(self.swarm.get_task(0).description, "Bulk Task 2")
+
+    def test_api_add_tasks_json_and_ndjson(self):
+        response = self.app.post('/swarm/add_tasks', json=[
+            {'description': 'Bulk API Task 1', 'specialization': 'math'},
+            {'description': 'Bulk API Task 2', 'priority': 9},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json['task_ids']), 2)
+
+        body = '\n'.join(json.dumps({'description': f'Streamed Task {i}'}) for i in range(5))
+        response = self.app.post('/swarm/add_tasks', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json['task_ids']), 5)
+
+        body = body + '\n{"description": \n' + json.dumps({'description': 'After'})
+        response = self.app.post('/swarm/add_tasks', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Task 5: invalid JSON", response.json['error'])
+        self.assertEqual(len(response.json['task_ids']), 5)
+
+        limited = SwarmIntegration(client_rate=1, client_burst=1500)
+        body = '\n'.join(json.dumps({'description': f'Limited Task {i}'}) for i in range(2500))
+        with patch.object(byoai_script, 'swarm', limited), patch.object(byoai_script, 'BULK_CHUNK_SIZE', 1000):
+            response = self.app.post('/swarm/add_tasks', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        self.assertEqual(len(response.json['task_ids']), limited.pending_tasks_count())
+
+        response = self.app.post('/swarm/add_tasks', json=[{'priority': 1}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_persistence_recovers_tasks(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        swarm = SwarmIntegration(persistence_dir=directory)
+        swarm.add_task("Queued Task", priority=1)
+        swarm.add_tasks([{'description': "Done Task", 'priority': 9, 'specialization': "math"},
+                         {'description': "In Flight Task", 'priority': 5}])
+        swarm.register_agent(0, ["math"])
+        swarm.complete_task(swarm.get_task(0), 0, 0.1)
+        swarm.task_log.snapshot()
+        swarm.get_task(0)
+        swarm.add_task("Late Task", priority=3, specialization="math")
+        swarm.task_log.close()
+
+        recovered = SwarmIntegration(persistence_dir=directory)
+        self.addCleanup(recovered.task_log.close)
+        statuses = {t.description: t.status for t in recovered.task_map.values()}
+        self.assertEqual(statuses, {"Queued Task": "pending", "Done Task": "completed",
+                                    "In Flight Task": "pending", "Late Task": "pending"})
+        self.assertEqual(recovered.task_counter, 4)
+        self.assertEqual(recovered.swarm.pending_tasks_count(), 3)
+        self.assertEqual(len(recovered.completed_tasks), 1)
+        recovered.register_agent(0, ["math"])
+        self.assertEqual(recovered.get_task(0).description, "In Flight Task")
+
+    def test_completed_task_retention(self):
+        swarm = SwarmIntegration(max_completed=2)
+        swarm.register_agent(0, [])
+        task_ids = [swarm.add_task(f"Task {i}") for i in range(3)]
+        for _ in task_ids:
+            swarm.complete_task(swarm.get_task(0), 0, 0.1)
+        self.assertEqual(len(swarm.completed_tasks), 2)
+        self.assertIsNone(swarm.get_task_status(task_ids[0]))
+        self.assertEqual(swarm.get_task_status(task_ids[2])['status'], 'completed')
+
+        swarm.completed_ttl = 60
+        swarm.completed_tasks[0].completion_time -= 120
+        swarm.remove_completed_tasks(max_completed=10)
+        self.assertEqual([t.task_id for t in swarm.completed_tasks], [task_ids[2]])
+
+        # Failed tasks and duplicates settled without running are retained
+        # the same way.
+        swarm = SwarmIntegration(max_completed=1, result_cache_size=10)
+        swarm.register_agent(0, [])
+        for i in range(5):
+            swarm.add_task(f"Failing {i}")
+            swarm.add_task(f"Failing {i}")
+            swarm.fail_task(swarm.get_task(0), 0, RuntimeError("boom"))
+        self.assertEqual(len(swarm.task_map), 1)
+        self.assertEqual(swarm.completed_tasks[0].status, "failed")
+
+    def test_task_has_no_instance_dict(self):
+        task = Task(1, "".join(["Slot", "ted"]), specialization="".join(["ma", "th"]))
+        self.assertFalse(hasattr(task, '__dict__'))
+        self.assertIs(task.description, Task(2, "".join(["Slot", "ted"])).description)
+
+    def test_swarm_statistics_counts_each_task_once(self):
+        self.swarm.add_task("Math Task", specialization="math")
+        self.swarm.add_tasks([{'description': "General Task"}, {'description': "Math Task 2", 'specialization': "math"}])
+        self.swarm.register_agent(0, ["math"])
+        task = self.swarm.get_task(0)
+        task.start_time -= 0.5
+        self.swarm.complete_task(task, 0, 0.5)
+        stats = self.swarm.get_swarm_statistics()
+        self.assertEqual(stats['tasks_per_specialization'], {"math": 2, "unspecialized": 1})
+        self.assertEqual(stats['completed_per_specialization'], {"math": 1})
+        self.assertEqual(stats['total_tasks_processed'], 3)
+        self.assertAlmostEqual(stats['average_completion_time'], 0.5, places=2)
+        self.assertAlmostEqual(stats['completion_time_quantiles']['p99'], 0.5, delta=0.01)
+        self.assertEqual(self.app.get('/swarm/statistics').status_code, 200)
+
+    def test_quantile_sketch_merge(self):
+        low, high = QuantileSketch(), QuantileSketch()
+        for i in range(1, 1001):
+            (low if i <= 500 else high).add(i / 1000)
+        merged = QuantileSketch().merge(low).merge(high)
+        self.assertEqual(merged.count, 1000)
+        self.assertAlmostEqual(merged.quantile(0.5), 0.5, delta=0.01)
+        self.assertAlmostEqual(merged.quantile(0.99), 0.99, delta=0.02)
+
+    def test_metrics_exposition(self):
+        self.swarm.add_tasks([{'description': "Math Task", 'specialization': "math"}, {'description': "General Task"}])
+        self.swarm.register_agent(0, ["math"])
+        task = self.swarm.get_task(0)
+        self.swarm.complete_task(task, 0, 0.2)
+        text = self.swarm.render_metrics()
+        self.assertIn("swarm_tasks_enqueued_total 2", text)
+        self.assertIn("swarm_tasks_claimed_total 1", text)
+        self.assertIn('swarm_queue_depth{specialization="unspecialized"} 1', text)
+        self.assertIn('swarm_agent_execution_seconds_count{agent="0"} 1', text)
+        self.assertIn('swarm_task_execution_seconds_bucket{specialization="math",le="0.25"} 1', text)
+        self.assertIn("swarm_get_task_lock_hold_seconds_count 1", text)
+        response = self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"# TYPE swarm_queue_wait_seconds histogram", response.data)
+
+    def test_in_flight_timeout_requeues_then_expires(self):
+        swarm = SwarmIntegration(max_retries=1, retry_backoff=0.05)
+        swarm.register_agent(0, ["math"])
+        swarm.register_agent(1, ["math"])
+        task_id = swarm.add_task("Stuck Task", specialization="math", timeout=0.1)
+        stuck = swarm.get_task(0)
+        retried = swarm.get_task(1, timeout=2)
+        self.assertIs(retried, stuck)
+        self.assertEqual(retried.retries, 1)
+        self.assertEqual(swarm.agent_load[0], 0)
+
+        swarm.complete_task(stuck, 0, 5.0)
+        self.assertEqual(swarm.get_task_status(task_id)['status'], 'in_progress')
+        time.sleep(0.3)
+        self.assertEqual(swarm.get_task_status(task_id)['status'], 'timed_out')
+        self.assertEqual(swarm.agent_load[1], 0)
+        self.assertEqual(list(swarm.completed_tasks), [stuck])
+        self.assertEqual(swarm.swarm.metrics.timed_out.value, 2)
+        self.assertEqual(swarm.swarm.metrics.requeued.value, 1)
+
+    def test_completed_task_is_not_expired(self):
+        swarm = SwarmIntegration(max_retries=0)
+        swarm.register_agent(0, [])
+        task_id = swarm.add_task("Quick Task", timeout=0.05)
+        swarm.complete_task(swarm.get_task(0), 0, 0.01)
+        time.sleep(0.15)
+        self.assertEqual(swarm.get_task_status(task_id)['status'], 'completed')
+        self.assertEqual(swarm.swarm.metrics.timed_out.value, 0)
+
+    def test_work_stealing_prefetch_and_steal(self):
+        swarm = SwarmIntegration(scheduler="work_stealing", prefetch=4)
+        swarm.register_agent(0, ["math", "language"])
+        swarm.register_agent(1, ["math"])
+        swarm.add_tasks([{'description': f"Math Task {i}", 'priority': 10 - i, 'specialization': "math"} for i in range(3)]
+                        + [{'description': "Language Task", 'priority': 1, 'specialization': "language"}])
+        first = swarm.get_task(0)
+        self.assertEqual(first.description, "Math Task 0")
+        self.assertEqual(swarm.scheduler.queued(0), 3)
+        self.assertEqual(swarm.swarm.pending_tasks_count(), 0)
+        self.assertEqual(swarm.get_swarm_state()['pending_tasks'], 3)
+
+        stolen = swarm.get_task(1)
+        self.assertEqual(stolen.description, "Math Task 1")
+        self.assertEqual(stolen.assigned_agent, 1)
+        self.assertEqual(stolen.status, "in_progress")
+        self.assertEqual([t.description for t in swarm.scheduler.queues[0].tasks], ["Language Task"])
+        self.assertEqual([t.description for t in swarm.scheduler.queues[1].tasks], ["Math Task 2"])
+
+        swarm.redistribute_tasks(threshold=2)
+        self.assertEqual(swarm.swarm.pending_tasks_count(), 0)
+        swarm.redistribute_tasks(threshold=1)
+        self.assertEqual(swarm.scheduler.queued(0), 0)
+        self.assertEqual(swarm.scheduler.queued(1), 0)
+        self.assertEqual(swarm.swarm.pending_tasks_count(), 2)
+
+    def test_autoscaler_scales_per_specialization(self):
+        autoscaler = Autoscaler(min_agents=1, max_agents=8, drain_time=10.0, scale_down_ticks=2)
+        observation = {
+            "specializations": {
+                "math": {"depth": 40, "arrivals": 2, "service_time": 1.0},
+                "image": {"depth": 0, "arrivals": 0, "service_time": None},
+                None: {"depth": 0, "arrivals": 0, "service_time": None},
+            },
+            "agents": {0: {"specializations": ["math"], "idle": False},
+                       1: {"specializations": ["image"], "idle": True},
+                       2: {"specializations": ["image"], "idle": True}},
+        }
+        to_add, to_remove = autoscaler.plan(observation, 1.0)
+        # 2/s at 80% utilization needs 3 agents, the backlog 4 more.
+        self.assertEqual(to_add, [["math"]] * 4)
+        self.assertEqual(to_remove, [])
+        to_add, to_remove = autoscaler.plan(observation, 1.0)
+        # The image surplus has lasted scale_down_ticks; one agent stays.
+        self.assertEqual(to_remove, [1])
+
+        # Specialized agents still run unspecialized tasks, so a math
+        # surplus alone does not remove agents that backlog needs.
+        autoscaler = Autoscaler(min_agents=1, max_agents=8, drain_time=10.0, scale_down_ticks=1)
+        observation = {
+            "specializations": {
+                "math": {"depth": 0, "arrivals": 0, "service_time": None},
+                None: {"depth": 30, "arrivals": 0, "service_time": 1.0},
+            },
+            "agents": {i: {"specializations": ["math"], "idle": True} for i in range(3)},
+        }
+        for _ in range(3):
+            self.assertEqual(autoscaler.plan(observation, 1.0), ([], []))
+
+        # Service time is measured per specialization, not per agent.
+        swarm = SwarmIntegration()
+        swarm.register_agent(0, ["math", "image"])
+        swarm.add_task("Math", priority=9, specialization="math")
+        swarm.add_task("Image", specialization="image")
+        swarm.complete_task(swarm.get_task(0), 0, 1.0)
+        swarm.complete_task(swarm.get_task(0), 0, 0.1)
+        observed = autoscaler.observe(swarm)["specializations"]
+        self.assertEqual((observed["math"]["service_time"], observed["image"]["service_time"]), (1.0, 0.1))
+
+    def test_remove_agent_requeues_local_queue(self):
+        swarm = SwarmIntegration(scheduler="work_stealing", prefetch=4)
+        swarm.register_agent(0, ["math"])
+        swarm.add_tasks([{'description': f"Math Task {i}", 'specialization': "math"} for i in range(3)])
+        swarm.get_task(0)
+        self.assertTrue(swarm.remove_agent(0))
+        self.assertFalse(swarm.remove_agent(0))
+        self.assertNotIn(0, swarm.active_agents)
+        self.assertNotIn(0, swarm.swarm.agents)
+        self.assertEqual(swarm.swarm.pending_tasks_count(), 2)
+
+        swarm.execution_time_range = (0.01, 0.02)
+        agent_id = swarm.add_agent(["math"])
+        time.sleep(0.05)
+        swarm.remove_agent(agent_id)
+        deadline = time.time() + 2
+        while agent_id in swarm.active_agents and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertNotIn(agent_id, swarm.active_agents)
+        self.assertNotIn(agent_id, swarm.get_swarm_state()['agent_load'])
+        self.assertNotIn(agent_id, swarm.agent_performance)
+        self.assertNotIn(f'agent="{agent_id}"', swarm.render_metrics())
+
+    def test_autoscaler_simulation_is_deterministic(self):
+        trace = burst_trace(60, {"math": 1.0}, [(10, 20, "math", 8.0)], seed=3)
+        results = [simulate(trace, Autoscaler(min_agents=1), {"math": 0.5}, 60, initial_agents=[["math"]])[0]
+                   for _ in range(2)]
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0]["tasks"], len(trace))
+        self.assertGreater(results[0]["peak_agents"], 1)
+        self.assertLess(results[0]["final_agents"], results[0]["peak_agents"])
+
+    def test_swarm_store_process(self):
+        address = os.path.join(tempfile.mkdtemp(), "swarm.sock")
+        self.addCleanup(shutil.rmtree, os.path.dirname(address))
+        store = start_store_process(lambda: serve_swarm(SwarmIntegration(), address, b"secret"))
+        self.addCleanup(store.terminate)
+        client = SwarmClient(address, b"secret")
+        task_id = client.add_task("Remote Task", priority=4, specialization="math")
+        self.assertEqual(client.add_tasks([{'description': "Remote Bulk Task"}]), [task_id + 1])
+        self.assertEqual(client.get_task_status(task_id)['description'], "Remote Task")
+        self.assertEqual(client.get_swarm_state()['pending_tasks'], 2)
+        self.assertEqual(parse_address("127.0.0.1:5000"), ("127.0.0.1", 5000))
+        self.assertEqual(parse_address(address), address)
+
+    def test_hash_ring_is_stable(self):
+        ring = HashRing(["node-0", "node-1", "node-2"])
+        keys = [f"specialization-{i}" for i in range(300)]
+        owners = [ring.node_for(key) for key in keys]
+        self.assertEqual(set(owners), {"node-0", "node-1", "node-2"})
+        grown = HashRing(["node-0", "node-1", "node-2", "node-3"])
+        moved = [key for key, owner in zip(keys, owners) if grown.node_for(key) != owner]
+        # Only keys taken over by the new node move.
+        self.assertTrue(all(grown.node_for(key) == "node-3" for key in moved))
+        self.assertLess(len(moved), len(keys) / 2)
+
+    def test_sharded_ids_and_transfer(self):
+        router = ShardRouter("node-1", parse_peers("node-0=http://127.0.0.1:1,node-1=http://127.0.0.1:2"))
+        node0 = SwarmIntegration(node_index=0, node_bits=NODE_BITS)
+        node1 = SwarmIntegration(node_index=router.node_index, node_bits=NODE_BITS)
+        ids = node1.add_tasks([{'description': f"Task {i}", 'priority': i} for i in range(3)])
+        self.assertEqual(ids, [(n << NODE_BITS) | 1 for n in (1, 2, 3)])
+        self.assertEqual({router.owner_of_task(task_id) for task_id in ids}, {"node-1"})
+        self.assertEqual(router.owner_of_specialization(None), "node-1")
+
+        node1.register_agent(0, [])
+        released = node1.release_tasks([], 5, "node-0")
+        self.assertEqual(released['tasks'], [[ids[2], "Task 2", 2, None, 30], [ids[1], "Task 1", 1, None, 30]])
+        self.assertEqual(node1.get_task_status(ids[2])['status'], "leased")
+        self.assertEqual(node1.ack_release(released['lease']), 2)
+        self.assertEqual(node1.ack_release(released['lease']), 0)
+        self.assertEqual(node1.get_task_status(ids[2])['status'], "transferred")
+        self.assertEqual(node1.get_task_status(ids[2])['assigned_agent'], "node-0")
+        self.assertEqual(node1.pending_tasks_count(), 1)
+        self.assertEqual(node0.adopt_tasks([[ids[2], "Task 2", 2, None, 30]]), 1)
+        node0.register_agent(0, [])
+        self.assertEqual(node0.get_task(0).task_id, ids[2])
+
+        # A lease that is never acknowledged puts its tasks back.
+        node1.add_task("Task 3")
+        lost = node1.release_tasks([], 5, "node-0", lease=0.05)
+        self.assertEqual([row[0] for row in lost['tasks']], [ids[0]])
+        time.sleep(0.2)
+        self.assertEqual(node1.ack_release(lost['lease']), 0)
+        self.assertEqual(node1.get_task_status(ids[0])['status'], "pending")
+        self.assertEqual(node1.pending_tasks_count(), 2)
+
+    def test_workflow_cache_enqueues_only_new_steps(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "flow.yml")
+        state_path = os.path.join(directory, "state.json")
+        parsed = []
+        def parse(name, data):
+            parsed.append(name)
+            return json.loads(data)
+        def write(steps):
+            with open(path, "w") as f:
+                json.dump({"name": "Flow", "steps": [{"name": step} for step in steps]}, f)
+        enqueued = []
+        refuse = set()
+        def execute(workflow, steps):
+            accepted = [step for step in steps if step["name"] not in refuse]
+            enqueued.extend(step["name"] for step in accepted)
+            return accepted
+
+        write(["a", "b", "b"])
+        cache = WorkflowCache(directory, parse, state_path)
+        cache.sync(execute)
+        cache.sync(execute)
+        self.assertEqual(enqueued, ["a", "b", "b"])
+        self.assertEqual(parsed, ["flow.yml"])
+
+        write(["a", "b", "b", "c", "b"])
+        cache.sync(execute)
+        self.assertEqual(enqueued, ["a", "b", "b", "c", "b"])
+
+        restarted = WorkflowCache(directory, parse, state_path)
+        restarted.sync(execute)
+        self.assertEqual(len(enqueued), 5)
+        self.assertEqual(len(parsed), 2)
+        self.assertEqual(restarted.get("flow.yml")["name"], "Flow")
+
+        # Refused steps are not counted and are retried on the next pass.
+        refuse.add("d")
+        write(["a", "b", "b", "c", "b", "d", "e"])
+        restarted.sync(execute)
+        self.assertEqual(enqueued[5:], ["e"])
+        refuse.clear()
+        restarted.sync(execute)
+        restarted.sync(execute)
+        self.assertEqual(enqueued[5:], ["e", "d"])
+
+    def test_result_cache_hits_and_coalesces(self):
+        swarm = SwarmIntegration(result_cache_size=10)
+        swarm.register_agent(0, ["language"])
+        first = swarm.add_task("Translate", specialization="language")
+        duplicate, other = swarm.add_tasks([{'description': "Translate", 'specialization': "language"},
+                                            {'description': "Translate", 'specialization': "math"}])
+        self.assertEqual(swarm.get_task_status(duplicate)['status'], "coalesced")
+        self.assertEqual(swarm.pending_tasks_count(), 2)
+
+        swarm.complete_task(swarm.get_task(0), 0, 0.1, "hola")
+        self.assertEqual(swarm.get_task_status(first)['result'], "hola")
+        self.assertEqual(swarm.get_task_status(duplicate)['status'], "completed")
+        self.assertEqual(swarm.get_task_status(duplicate)['result'], "hola")
+
+        hit = swarm.add_task("Translate", specialization="language")
+        self.assertEqual(swarm.get_task_status(hit)['status'], "completed")
+        self.assertEqual(swarm.get_task_status(hit)['result'], "hola")
+        self.assertEqual(swarm.pending_tasks_count(), 1)
+        cache_stats = swarm.get_swarm_statistics()['result_cache']
+        self.assertEqual((cache_stats['hits'], cache_stats['misses'], cache_stats['coalesced']), (1, 2, 1))
+        self.assertEqual(cache_stats['hit_rate'], 0.25)
+        self.assertEqual(swarm.stats.snapshot()['completed'], 3)
+
+    def test_result_cache_failure_ttl_and_eviction(self):
+        swarm = SwarmIntegration(result_cache_size=10)
+        swarm.register_agent(0, [])
+        swarm.add_task("Flaky")
+        duplicate = swarm.add_task("Flaky")
+        swarm.fail_task(swarm.get_task(0), 0, ValueError("boom"))
+        self.assertEqual(swarm.get_task_status(duplicate)['status'], "failed")
+        swarm.add_task("Flaky")
+        self.assertEqual(swarm.pending_tasks_count(), 1)
+
+        cache = ResultCache(max_entries=2, ttl=0.05)
+        tasks = [Task(i, f"Task {i}") for i in range(3)]
+        for task in tasks:
+            cache.admit(task)
+            cache.complete(task, task.task_id)
+        self.assertEqual(cache.admit(Task(9, "Task 0"))[0], "miss")
+        self.assertEqual(cache.admit(Task(10, "Task 2")), ("hit", 2))
+        time.sleep(0.06)
+        self.assertEqual(cache.admit(Task(11, "Task 2"))[0], "miss")
+
+        # A cache hit already evicted by retention is answered as a plain add.
+        with patch.object(byoai_script, 'CONTEXT_RESULT_CACHE_SIZE', 10), \
+                patch.object(byoai_script.swarm, 'get_task_status', return_value=None):
+            response = self.app.post('/swarm/add_task', json={"description": "Evicted"})
+        self.assertEqual(response.status_code, 201)
+
+    def test_snapshot_journal_round_trip(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "snapshot.log")
+        swarm = SwarmIntegration(max_completed=1, snapshot_interval=0.01, snapshot_journal=path)
+        self.addCleanup(swarm.snapshot.stop)
+        swarm.register_agent(0, [])
+        first, second = swarm.add_tasks([{'description': "Task 1"}, {'description': "Task 2"}])
+        reader = SnapshotReader(path, interval=0)
+        def wait_for(check):
+            deadline = time.time() + 2
+            while not check() and time.time() < deadline:
+                time.sleep(0.01)
+            return check()
+        self.assertTrue(wait_for(lambda: reader.task_status(second) is not None))
+        self.assertEqual(json.loads(reader.task_status(first))['status'], "pending")
+        self.assertEqual(json.loads(swarm.snapshot.task_status(first))['status'], "pending")
+        self.assertEqual(json.loads(reader.swarm_state())['pending_tasks'], 2)
+
+        swarm.complete_task(swarm.get_task(0), 0, 0.1, "done")
+        swarm.complete_task(swarm.get_task(0), 0, 0.1, "done")
+        # max_completed=1 evicts the first task again.
+        self.assertTrue(wait_for(lambda: reader.task_status(first) is None))
+        self.assertEqual(json.loads(reader.task_status(second))['result'], "done")
+        self.assertEqual(json.loads(reader.agent_load()), {"0": 0})
+
+        swarm.snapshot.max_journal_bytes = 0
+        inode = os.stat(path).st_ino
+        swarm.add_task("Task 3")
+        self.assertTrue(wait_for(lambda: os.stat(path).st_ino != inode and reader.task_status(second + 1) is not None))
+        self.assertIsNone(reader.task_status(first))
+        self.assertEqual(json.loads(reader.task_status(second))['status'], "completed")
+
+    def test_task_event_stream_and_wait(self):
+        import http.client
+        swarm = SwarmIntegration(queue_capacities={"image": 1})
+        swarm.register_agent(0, ["math"])
+        port = EventServer(swarm, swarm.swarm.events, heartbeat=0.05).start("127.0.0.1", 0)
+        done, first, second = swarm.add_tasks([{'description': "Done", 'specialization': "math"},
+                                                {'description': "Sum", 'specialization': "math"},
+                                                {'description': "Other", 'specialization': "math"}])
+        swarm.complete_task(swarm.get_task(0), 0, 0.1, 1)
+
+        stream = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        stream.request("GET", f"/swarm/events?task_ids={done},{first}")
+        events = stream.getresponse()
+        self.assertEqual(events.getheader("Content-Type"), "text/event-stream")
+        waiter = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        waiter.request("GET", f"/swarm/wait?task_ids={done},{first}&timeout=5")
+        time.sleep(0.1)
+        swarm.complete_task(swarm.get_task(0), 0, 0.1, 2)
+
+        waited = json.loads(waiter.getresponse().read())
+        self.assertEqual(waited['pending'], [])
+        self.assertEqual({t['task_id']: t['result'] for t in waited['tasks']}, {done: 1, first: 2})
+        data = [json.loads(line[6:]) for line in events.read().decode().splitlines() if line.startswith("data: ")]
+        self.assertEqual([(e['task_id'], e['result']) for e in data], [(done, 1), (first, 2)])
+
+        waiter = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        waiter.request("GET", f"/swarm/wait?task_ids={second}&timeout=0.1")
+        self.assertEqual(json.loads(waiter.getresponse().read()), {"tasks": [], "pending": [second]})
+
+        shed = swarm.add_task("Image", priority=1, specialization="image")
+        swarm.add_task("Urgent image", priority=9, specialization="image")
+        waiter = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        waiter.request("GET", f"/swarm/wait?task_ids={shed}&timeout=5")
+        waited = json.loads(waiter.getresponse().read())
+        self.assertEqual([(t['task_id'], t['status']) for t in waited['tasks']], [(shed, "shed")])
+
+        response = app.test_client().get(f"/swarm/wait?task_ids={second}")
+        self.assertEqual(response.status_code, 307)
+        self.assertTrue(response.location.endswith(f"/swarm/wait?task_ids={second}"))
+
+    def test_task_events_recover_from_ring_buffer_gap(self):
+        import http.client
+        swarm = SwarmIntegration()
+        swarm.swarm.events = EventBus(capacity=2)
+        swarm.register_agent(0, [])
+        server = EventServer(swarm, swarm.swarm.events, heartbeat=5)
+        port = server.start("127.0.0.1", 0)
+        first, second = swarm.add_tasks([{'description': "First"}, {'description': "Second"}])
+        swarm.add_tasks([{'description': f"Filler {i}"} for i in range(3)])
+
+        waiter = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        waiter.request("GET", f"/swarm/wait?task_ids={first}&timeout=5")
+        stream = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        stream.request("GET", f"/swarm/events?task_ids={second}")
+        events = stream.getresponse()
+        time.sleep(0.1)
+
+        def complete_all():
+            # On the event loop, so no subscriber wakes until the
+            # completions of first and second have left the buffer.
+            for _ in range(5):
+                swarm.complete_task(swarm.get_task(0), 0, 0.1, "done")
+            done.set()
+        done = threading.Event()
+        server.loop.call_soon_threadsafe(complete_all)
+        self.assertTrue(done.wait(5))
+
+        waited = json.loads(waiter.getresponse().read())
+        self.assertEqual(([t['task_id'] for t in waited['tasks']], waited['pending']), ([first], []))
+        lines = events.read().decode().splitlines()
+        self.assertIn("event: gap", lines)
+        data = [json.loads(line[6:]) for line in lines if line.startswith("data: ")]
+        self.assertEqual(data[0], {"first_seq": 1, "last_seq": 3})
+        self.assertEqual([(e['task_id'], e['status']) for e in data[1:]], [(second, "completed")])
+
+    def test_admission_sheds_lowest_priority_and_throttles(self):
+        swarm = SwarmIntegration(queue_capacities={"math": 2, "image": 1}, client_rate=1, client_burst=3)
+        low = swarm.add_task("Low", priority=1, specialization="math")
+        high = swarm.add_task("High", priority=9, specialization="math")
+        medium = swarm.add_task("Medium", priority=5, specialization="math")
+        self.assertEqual(swarm.get_task_status(low)['status'], "shed")
+        with self.assertRaises(Rejected) as refused:
+            swarm.add_task("Lowest", priority=0, specialization="math")
+        self.assertEqual(refused.exception.retry_after, 1.0)
+        self.assertEqual(swarm.add_tasks([{'description': "Image", 'specialization': "image"},
+                                          {'description': "Image 2", 'specialization': "image"},
+                                          {'description': "Urgent", 'priority': 9, 'specialization': "math"}])[1:],
+                         [None, medium + 2])
+        self.assertEqual(swarm.get_task_status(medium)['status'], "shed")
+        self.assertEqual(swarm.swarm.queue_depths(), {"math": 2, "image": 1})
+
+        swarm.add_task("Client task", client="a")
+        swarm.add_tasks([{'description': "Client task"}] * 2, client="a")
+        with self.assertRaises(Rejected) as throttled:
+            swarm.add_task("Client task", client="a")
+        self.assertGreater(throttled.exception.retry_after, 0.5)
+        swarm.add_task("Client task", client="b")
+        self.assertEqual(swarm.get_swarm_statistics()['admission'],
+                         {"throttled": 1, "rejected": 2, "shed": 2, "clients": 2})
+
+        # Cache hits and duplicates of a queued task never enter the queue,
+        # so they neither shed nor get refused.
+        swarm = SwarmIntegration(result_cache_size=10, queue_capacities={"math": 1})
+        swarm.register_agent(0, ["math"])
+        done = swarm.add_task("Cached", specialization="math")
+        swarm.complete_task(swarm.get_task(0), 0, 0.01, "42")
+        filler = swarm.add_task("Filler", priority=1, specialization="math")
+        swarm.add_task("Cached", priority=9, specialization="math")
+        swarm.add_task("Filler", priority=9, specialization="math")
+        self.assertEqual(swarm.add_tasks([{'description': "Cached"}, {'description': "Cached", 'priority': 9,
+                                                                      'specialization': "math"}])[1:], [done + 5])
+        self.assertEqual(swarm.get_task_status(filler)['status'], "pending")
+
+        with patch.object(byoai_script.swarm, 'add_task', side_effect=Rejected("Queue for math tasks is full", 2.5)):
+            response = self.app.post('/swarm/add_task', json={"description": "Task", "specialization": "math"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], "3")
+        self.assertEqual(response.get_json()['retry_after'], 2.5)
+
+    def test_scheduling_policies(self):
+        swarm = SwarmIntegration()
+        swarm.register_agent(0, [])
+        ids = [swarm.add_task(f"Task {i}", priority=5) for i in range(5)]
+        self.assertEqual([swarm.get_task(0).task_id for _ in ids], ids)
+
+        def task(task_id, priority=0, enqueued=0.0, specialization=None, tenant=None):
+            task = Task(task_id, f"Task {task_id}", priority, specialization, tenant=tenant)
+            task.enqueue_time = enqueued
+            return task
+        store = TaskStore(Aging(rate=1.0))
+        for t in (task(1, 1, 0.0), task(2, 5, 10.0), task(3, 5, 1.0), task(4, 9, 10.0)):
+            store.put(t)
+        self.assertEqual([store.claim([]).task_id for _ in range(4)], [3, 1, 4, 2])
+        for t in (task(5, 1, 0.0), task(6, 5, 10.0), task(7, 2, 20.0)):
+            store.put(t)
+        self.assertEqual(store.evict_lowest(None, 3).task_id, 5)
+        self.assertIsNone(store.evict_lowest(None, 2))
+        # Evicted tasks are skipped by claims and claimed ones by evictions.
+        self.assertEqual([store.claim([]).task_id, len(store), store.depth()], [6, 1, 1])
+        self.assertEqual(store.evict_lowest(None, 9).task_id, 7)
+        self.assertIsNone(store.claim([]))
+        self.assertEqual(list(store), [])
+
+        store = TaskStore(WeightedFairQueuing({"math": 2}))
+        for i in range(6):
+            store.put(task(10 + i, specialization="math"))
+            store.put(task(20 + i, 9, specialization="language"))
+        claimed = [store.claim(["math", "language"]).specialization for _ in range(6)]
+        self.assertEqual(claimed.count("math"), 4)
+        store = TaskStore(WeightedFairQueuing(flow="tenant"))
+        for i in range(6):
+            store.put(task(30 + i, tenant="a"))
+        store.put(task(40, tenant="b"))
+        store.put(task(41, tenant="b"))
+        self.assertEqual([store.claim([]).tenant for _ in range(4)], ["a", "b", "a", "b"])
+
+    def test_deterministic_work_reproducible(self):
+        body = DeterministicWork(0.01, seed=3, factors={"image": 4})
+        durations = [body.duration((i, "Task", "math")) for i in range(50)]
+        self.assertEqual(durations, [DeterministicWork(0.01, seed=3).duration((i, "Task", "math")) for i in range(50)])
+        self.assertNotEqual(durations, [DeterministicWork(0.01, seed=4).duration((i, "Task", "math")) for i in range(50)])
+        self.assertAlmostEqual(body.duration((7, "Task", "image")), 4 * durations[7])
+        self.assertEqual(DeterministicWork(0).duration((1, "Task", None)), 0.0)
+
+        swarm = SwarmIntegration()
+        swarm.set_default_task_body(DeterministicWork(0))
+        swarm.register_agent(0, ["math"])
+        threading.Thread(target=swarm.agent_worker, args=(0,), daemon=True).start()
+        task_id = swarm.add_task("Deterministic task", specialization="math")
+        deadline = time.time() + 5
+        while swarm.task_map[task_id].status != "completed" and time.time() < deadline:
+            time.sleep(0.01)
+        swarm.remove_agent(0)
+        self.assertEqual(swarm.task_map[task_id].status, "completed")
+
     def test_performance_under_load(self):
         start_time = time.time()
         num_tasks = 1000
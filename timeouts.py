@@ -0,0 +1,54 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+
+class TimeoutReaper:
+    """Deadline heap for in-flight tasks.
+
+    Claims push (deadline, attempt) entries; completed or reclaimed tasks are
+    not removed but skipped when their entry surfaces, so every operation is
+    O(log n) and nothing ever scans task_map. The same heap also schedules
+    delayed callbacks, which the swarm uses for retry backoff.
+    """
+
+    def __init__(self, on_expire):
+        self.on_expire = on_expire
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def track(self, task):
+        if task.timeout:
+            self._push(time.monotonic() + task.timeout, (self.on_expire, task, task.attempts))
+
+    def call_later(self, delay, callback, *args):
+        self._push(time.monotonic() + delay, (callback,) + args)
+
+    def _push(self, when, action):
+        with self.condition:
+            heapq.heappush(self.heap, (when, next(self.counter), action))
+            if self.heap[0][2] is action:
+                self.condition.notify()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    self.condition.wait(self.heap[0][0] - time.monotonic() if self.heap else None)
+                _, _, action = heapq.heappop(self.heap)
+            # Called without the reaper lock so handlers may take the swarm
+            # lock and schedule further callbacks.
+            try:
+                action[0](*action[1:])
+            except Exception:
+                logging.exception("Timeout reaper callback failed")
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import deque
+
+
+class LocalQueue:
+    def __init__(self, specializations):
+        self.specializations = specializations
+        self.tasks = deque()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tasks)
+
+
+class WorkStealingScheduler:
+    """Per-agent local deques in front of the shared Swarm store.
+
+    An agent serves itself from its own deque, refills it `prefetch` tasks at
+    a time with one acquisition of the swarm lock, and when the store has
+    nothing it can run it steals half of the runnable tasks from the back of
+    the busiest peer's deque. Tasks sitting in a local deque stay "pending"
+    until their owner starts them.
+    """
+
+    def __init__(self, swarm, prefetch=4):
+        self.swarm = swarm
+        self.prefetch = prefetch
+        self.queues = {}
+
+    def register(self, agent_id, specializations):
+        self.queues[agent_id] = LocalQueue(specializations)
+
+    def unregister(self, agent_id):
+        # Returns whatever the agent had queued so it can be requeued.
+        queue = self.queues.pop(agent_id, None)
+        if queue is None:
+            return []
+        with queue.lock:
+            tasks = list(queue.tasks)
+            queue.tasks.clear()
+        return tasks
+
+    def queued(self, agent_id):
+        queue = self.queues.get(agent_id)
+        return len(queue) if queue else 0
+
+    def drain(self, agent_id, keep=0):
+        queue = self.queues.get(agent_id)
+        if queue is None:
+            return []
+        with queue.lock:
+            tasks = []
+            while len(queue.tasks) > keep:
+                tasks.append(queue.tasks.pop())
+        return tasks
+
+    def get_task(self, agent_id, timeout=None):
+        deadline = time.monotonic() + timeout if timeout else None
+        queue = self.queues[agent_id]
+        while True:
+            task = self._next_task(agent_id, queue)
+            if task:
+                self.swarm.start_task(task, agent_id)
+                return task
+            if deadline is None:
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self.swarm.wait_for_task(agent_id, queue.specializations, remaining)
+
+    def _next_task(self, agent_id, queue):
+        with queue.lock:
+            if queue.tasks:
+                return queue.tasks.popleft()
+        tasks = self.swarm.take_tasks(agent_id, queue.specializations, self.prefetch)
+        if tasks:
+            if len(tasks) > 1:
+                with queue.lock:
+                    queue.tasks.extend(tasks[1:])
+                # Idle peers were not woken for these; let them come and steal.
+                self.swarm.wake_idle(tasks[1:])
+            return tasks[0]
+        return self._steal(agent_id, queue)
+
+    def _steal(self, agent_id, queue):
+        specializations = queue.specializations
+        victims = sorted((peer for peer_id, peer in list(self.queues.items()) if peer_id != agent_id and peer.tasks),
+                         key=len, reverse=True)
+        for victim in victims:
+            with victim.lock:
+                runnable = [task for task in reversed(victim.tasks)
+                            if task.specialization is None or task.specialization in specializations]
+                # Take from the back, but keep the victim's order so the
+                # thief still runs the best of what it took first.
+                stolen = runnable[:(len(victim.tasks) + 1) // 2][::-1]
+                for task in stolen:
+                    victim.tasks.remove(task)
+            if stolen:
+                for task in stolen:
+                    task.assigned_agent = agent_id
+                if len(stolen) > 1:
+                    with queue.lock:
+                        queue.tasks.extend(stolen[1:])
+                return stolen[0]
+        return None
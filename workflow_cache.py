@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import Counter
+
+
+def step_key(step):
+    return hashlib.sha1(json.dumps(step, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class WorkflowCache:
+    """Parsed workflows keyed by file name, plus what has been enqueued.
+
+    A file is only re-read when its mtime or size changes, and only reparsed
+    when its content hash changes. `sync()` enqueues the steps of each
+    workflow that have not been enqueued before, counted per distinct step,
+    so reloading an edited file adds just the new or changed steps. With a
+    state_path the cache and the enqueued counts survive restarts.
+    """
+
+    def __init__(self, directory, parse, state_path=None, suffix=".yml"):
+        self.directory = directory
+        self.parse = parse
+        self.state_path = state_path
+        self.suffix = suffix
+        self.entries = {}
+        if state_path and os.path.exists(state_path):
+            try:
+                with open(state_path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable workflow state {state_path}: {e}")
+
+    def get(self, name):
+        path = os.path.join(self.directory, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            logging.error(f"Workflow file not found: {name}")
+            return None
+        entry = self.entries.get(name)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["workflow"]
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if entry is None or entry["digest"] != digest:
+            workflow = self.parse(name, data)
+            entry = self.entries[name] = {"workflow": workflow, "digest": digest,
+                                          "enqueued": entry["enqueued"] if entry else {}}
+        entry["mtime_ns"] = stat.st_mtime_ns
+        entry["size"] = stat.st_size
+        return entry["workflow"]
+
+    def sync(self, execute):
+        # execute(workflow, steps) enqueues the given steps of a workflow and
+        # returns those it accepted. Steps it refused, or lost by raising,
+        # are retried on the next pass even if the file is unchanged.
+        changed = False
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(self.suffix))
+        for name in names:
+            previous = self.entries.get(name)
+            previous = previous and not previous.get("retry") and (previous["mtime_ns"], previous["size"])
+            workflow = self.get(name)
+            entry = self.entries.get(name)
+            if entry is None or (entry["mtime_ns"], entry["size"]) == previous:
+                continue
+            changed = True
+            entry.pop("retry", None)
+            if not workflow:
+                logging.error(f"Failed to load workflow: {name}")
+                continue
+            enqueued = Counter(entry["enqueued"])
+            steps = []
+            for step in workflow["steps"]:
+                key = step_key(step)
+                if enqueued[key] > 0:
+                    enqueued[key] -= 1
+                else:
+                    steps.append(step)
+            if not steps:
+                continue
+            logging.info(f"Executing workflow: {workflow['name']} ({len(steps)} new or changed steps)")
+            try:
+                accepted = execute(workflow, steps)
+            except Exception:
+                logging.exception(f"Failed to enqueue workflow: {name}")
+                accepted = []
+            for step in accepted:
+                key = step_key(step)
+                entry["enqueued"][key] = entry["enqueued"].get(key, 0) + 1
+            if len(accepted) < len(steps):
+                entry["retry"] = True
+        for name in set(self.entries) - set(names):
+            del self.entries[name]
+            changed = True
+        if changed:
+            self.save()
+
+    def save(self):
+        if not self.state_path:
+            return
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.state_path)
+
+    def watch(self, execute, interval=2.0):
+        # Polls the directory; unchanged files cost one stat() per pass.
+        while True:
+            time.sleep(interval)
+            try:
+                self.sync(execute)
+            except Exception:
+                logging.exception("Workflow reload failed")